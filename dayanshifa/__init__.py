@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+大衍筮法 - 不依赖界面的核心逻辑包
+"""
+
+from dayanshifa.core import (
+    HEXAGRAMS, HEXAGRAM_KEYS, HEXAGRAM_TABLE, HEXAGRAM_INDEX, HEXAGRAM_SYMBOLS,
+    DATE_FORMAT, HISTORY_FIELDS,
+    DaYanShiFa, encode_yao_values, key_to_code, code_to_key, make_record,
+)
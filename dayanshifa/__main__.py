@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+大衍筮法命令行入口: python -m dayanshifa
+"""
+
+import sys
+
+from dayanshifa.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+大衍筮法精确概率分析 - 支持参数化的变体
+以（蓍草数, 第几变）为状态做记忆化动态规划，求爻值、六十四卦
+以及本卦→之卦（64×64）的精确概率；结果按参数缓存到磁盘
+"""
+
+import json
+import os
+import warnings
+from fractions import Fraction
+from functools import lru_cache
+
+from dayanshifa.core import HEXAGRAM_KEYS
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dayanshifa")
+
+# 触摸分堆模型：蓍草中心相对蓍草间距的偏移（宽3dp、间距8dp）
+TOUCH_CENTER_OFFSET = Fraction(3, 16)
+
+SPLIT_MODELS = ("uniform", "touch")
+
+# 爻值 → (本卦阴阳, 之卦阴阳)；其余爻值按奇阳偶阴且不变处理
+_LINE_BITS = {6: (0, 1), 7: (1, 1), 8: (0, 0), 9: (1, 0)}
+
+_memory_cache = {}
+
+
+def split_weights(straw_count, split="uniform"):
+    """分两仪时左堆根数的分布：{左堆根数: 概率}
+
+    uniform: 左堆1..n-1等可能
+    touch:   在蓍草排上均匀点击，按点击位置左侧的蓍草数分堆（同界面逻辑，
+             两端越界时夹到1和n-1）
+    """
+    if split == "uniform":
+        weight = Fraction(1, straw_count - 1)
+        return {left: weight for left in range(1, straw_count)}
+
+    if split == "touch":
+        # 第k个区间宽度：k=0为偏移量，1..n-1为1，k=n为1-偏移量，总宽n
+        weights = {}
+        for k in range(straw_count + 1):
+            if k == 0:
+                width = TOUCH_CENTER_OFFSET
+            elif k == straw_count:
+                width = 1 - TOUCH_CENTER_OFFSET
+            else:
+                width = Fraction(1)
+            left = min(max(k, 1), straw_count - 1)
+            weights[left] = weights.get(left, 0) + width / straw_count
+        return weights
+
+    raise ValueError(f"未知的分堆模型: {split}")
+
+
+def _remainder(pile_count, divisor):
+    """求余（整除时余数记divisor，空堆余数为0）"""
+    if pile_count == 0:
+        return 0
+    return (pile_count - 1) % divisor + 1
+
+
+@lru_cache(maxsize=None)
+def _change_distribution(straw_count, divisor, split):
+    """一变的分布：{变后蓍草数: 概率}"""
+    if straw_count < 2:
+        raise ValueError(f"仅剩{straw_count}根蓍草，无法分为两堆")
+    distribution = {}
+    for left, p in split_weights(straw_count, split).items():
+        right = straw_count - left - 1
+        removed = _remainder(left, divisor) + _remainder(right, divisor) + 1
+        remaining = straw_count - removed
+        distribution[remaining] = distribution.get(remaining, 0) + p
+    return distribution
+
+
+@lru_cache(maxsize=None)
+def _final_distribution(straw_count, change, changes, divisor, split):
+    """从第change变、当前straw_count根起，三变结束时蓍草数的分布"""
+    if change == changes:
+        return {straw_count: Fraction(1)}
+
+    result = {}
+    for remaining, p in _change_distribution(straw_count, divisor, split).items():
+        for final, q in _final_distribution(remaining, change + 1, changes, divisor, split).items():
+            result[final] = result.get(final, 0) + p * q
+    return result
+
+
+def line_distribution(working_straws=49, divisor=4, changes=3, split="uniform"):
+    """一爻的精确分布：{爻值: 概率}
+
+    三变途中任一可能状态不足2根蓍草时引发ValueError
+    """
+    if divisor < 1:
+        raise ValueError("揲数须至少为1")
+    line = {}
+    for final, p in _final_distribution(working_straws, 0, changes, divisor, split).items():
+        value = final // divisor
+        line[value] = line.get(value, 0) + p
+    return dict(sorted(line.items()))
+
+
+def _hexagram_distributions(lines):
+    """由爻值分布求本卦、之卦及本卦→之卦的分布（各爻独立同分布）"""
+    # (本卦阴阳, 之卦阴阳) 的概率
+    bits = {}
+    for value, p in lines.items():
+        pair = _LINE_BITS.get(value, (value % 2, value % 2))
+        bits[pair] = bits.get(pair, 0) + p
+
+    pairs = {}
+    for original in HEXAGRAM_KEYS:
+        for changed in HEXAGRAM_KEYS:
+            p = Fraction(1)
+            for o, c in zip(original, changed):
+                p *= bits.get((int(o), int(c)), 0)
+                if not p:
+                    break
+            if p:
+                pairs[(original, changed)] = p
+
+    original_dist = dict.fromkeys(HEXAGRAM_KEYS, Fraction(0))
+    changed_dist = dict.fromkeys(HEXAGRAM_KEYS, Fraction(0))
+    for (original, changed), p in pairs.items():
+        original_dist[original] += p
+        changed_dist[changed] += p
+    return original_dist, changed_dist, pairs
+
+
+def _cache_path(cache_dir, params):
+    """缓存文件路径"""
+    name = "dayan_{total_straws}_{working_straws}_{divisor}_{changes}_{split}".format(**params)
+    # 触摸模型的表随蓍草几何而变，偏移量计入文件名
+    if "touch_offset" in params:
+        name += "_" + params["touch_offset"].replace("/", "-")
+    name += ".json"
+    return os.path.join(cache_dir, name)
+
+
+def _dump(result):
+    """分析结果 → 可JSON序列化的字典（概率以'分子/分母'表示）"""
+    return {
+        "params": result["params"],
+        "lines": {str(k): str(v) for k, v in result["lines"].items()},
+        "original": {k: str(v) for k, v in result["original"].items()},
+        "changed": {k: str(v) for k, v in result["changed"].items()},
+        "pairs": {f"{o}>{c}": str(v) for (o, c), v in result["pairs"].items()},
+    }
+
+
+def _load(data):
+    """_dump 的逆过程"""
+    return {
+        "params": data["params"],
+        "lines": {int(k): Fraction(v) for k, v in data["lines"].items()},
+        "original": {k: Fraction(v) for k, v in data["original"].items()},
+        "changed": {k: Fraction(v) for k, v in data["changed"].items()},
+        "pairs": {tuple(k.split(">")): Fraction(v) for k, v in data["pairs"].items()},
+    }
+
+
+def analyze(total_straws=50, working_straws=49, divisor=4, changes=3,
+            split="uniform", cache_dir=DEFAULT_CACHE_DIR):
+    """精确分析一种大衍变体
+
+    返回字典：
+      params:   分析参数
+      lines:    {爻值: 概率}
+      original: {卦键: 本卦概率}
+      changed:  {卦键: 之卦概率}（无变爻时之卦即本卦）
+      pairs:    {(本卦键, 之卦键): 概率}
+    total_straws 为大衍之数，只用于校验与标记结果，演算只取决于用数 working_straws；
+    cache_dir 为None时不读写磁盘缓存
+    """
+    if split not in SPLIT_MODELS:
+        raise ValueError(f"未知的分堆模型: {split}")
+    if not 2 < working_straws <= total_straws:
+        raise ValueError("用数须大于2且不超过总数")
+    if divisor < 1:
+        raise ValueError("揲数须至少为1")
+    if changes < 0:
+        raise ValueError("变数不能为负")
+
+    params = {
+        "total_straws": total_straws,
+        "working_straws": working_straws,
+        "divisor": divisor,
+        "changes": changes,
+        "split": split,
+    }
+    if split == "touch":
+        params["touch_offset"] = str(TOUCH_CENTER_OFFSET)
+    key = tuple(params.values())
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    path = _cache_path(cache_dir, params) if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = _load(json.load(f))
+            # 概率之和不为1的缓存（旧版未校验时写入）视为无效
+            if sum(result["lines"].values()) == 1:
+                _memory_cache[key] = result
+                return result
+        except (OSError, ValueError, KeyError):
+            pass
+
+    lines = line_distribution(working_straws, divisor, changes, split)
+    original, changed, pairs = _hexagram_distributions(lines)
+    result = {
+        "params": params,
+        "lines": lines,
+        "original": original,
+        "changed": changed,
+        "pairs": pairs,
+    }
+    _memory_cache[key] = result
+
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(_dump(result), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            warnings.warn(f"写入分析缓存失败: {e}")
+    return result
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+批量卦象分类 - 基于NumPy向量化
+输入 (N, 6) 爻值数组（第0列为初爻），一次求出本卦码、之卦码、变爻掩码及变爻数，
+卦名、卦象通过64项查找数组以花式索引取得
+"""
+
+import numpy as np
+
+from dayanshifa.core import HEXAGRAM_TABLE, HEXAGRAM_INDEX
+
+# 卦码 → 卦名 / 卦象 / 卦键 / 卦序
+NAMES = np.array([entry[0] for entry in HEXAGRAM_TABLE])
+XIANGS = np.array([entry[1] for entry in HEXAGRAM_TABLE])
+KEYS = np.array([entry[2] for entry in HEXAGRAM_TABLE])
+INDICES = np.array(HEXAGRAM_INDEX, dtype=np.int8)
+
+# 变爻掩码 → 变爻数
+MOVING_COUNTS = np.array([bin(mask).count("1") for mask in range(64)], dtype=np.int8)
+
+# 爻位权重（初爻为最低位）
+_LINE_WEIGHTS = np.array([1, 2, 4, 8, 16, 32], dtype=np.uint8)
+
+
+def classify(yao_values):
+    """批量求卦
+
+    返回字典（均为长度N的uint8/int8数组）：
+      original:     本卦码
+      changed:      之卦码（无变爻时同本卦码）
+      moving_mask:  变爻掩码
+      moving_count: 变爻数
+    """
+    yao = np.asarray(yao_values)
+    if yao.ndim != 2 or yao.shape[1] != 6:
+        raise ValueError("爻值数组形状须为 (N, 6)")
+    if yao.size and (yao.min() < 6 or yao.max() > 9):
+        raise ValueError("爻值须为6/7/8/9")
+
+    # 奇数为阳；6、9为变爻（恰为3的倍数）
+    original = ((yao & 1).astype(np.uint8) * _LINE_WEIGHTS).sum(axis=1, dtype=np.uint8)
+    moving_mask = ((yao % 3 == 0).astype(np.uint8) * _LINE_WEIGHTS).sum(axis=1, dtype=np.uint8)
+
+    return {
+        "original": original,
+        "changed": original ^ moving_mask,
+        "moving_mask": moving_mask,
+        "moving_count": MOVING_COUNTS[moving_mask],
+    }
+
+
+def names(codes):
+    """卦码数组 → 卦名数组"""
+    return NAMES[codes]
+
+
+def xiangs(codes):
+    """卦码数组 → 卦象数组"""
+    return XIANGS[codes]
+
+
+def indices(codes):
+    """卦码数组 → 卦序数组"""
+    return INDICES[codes]
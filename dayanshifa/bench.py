@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+起卦性能基准与统计校验
+测量逐步演算（界面同款流程）、别名表抽样、NumPy批量引擎的每秒起卦数，
+并以卡方检验对照精确分布与传统的 1/16、5/16、7/16、3/16；
+输出为JSON，种子固定，便于不同版本间比较
+"""
+
+import math
+import platform
+import random
+import time
+
+from dayanshifa import analysis, sampler
+from dayanshifa.core import DaYanShiFa
+
+# 传统大衍筮法的爻值分布
+CLASSICAL_DISTRIBUTION = {6: 1 / 16, 7: 5 / 16, 8: 7 / 16, 9: 3 / 16}
+
+
+def chi2_sf_3(x):
+    """自由度为3的卡方分布右尾概率"""
+    return math.erfc(math.sqrt(x / 2)) + math.sqrt(2 * x / math.pi) * math.exp(-x / 2)
+
+
+def check_distribution(counts, expected):
+    """卡方拟合检验：counts为{爻值: 次数}，expected为{爻值: 概率}"""
+    total = sum(counts.values())
+    chi2 = 0.0
+    for value, p in expected.items():
+        e = total * float(p)
+        chi2 += (counts.get(value, 0) - e) ** 2 / e
+    return {
+        "chi2": chi2,
+        "p_value": chi2_sf_3(chi2),
+        "frequencies": {str(v): counts.get(v, 0) / total for v in expected},
+    }
+
+
+def _measure(func, count):
+    """运行func(count)，返回计时结果与其返回值"""
+    start = time.perf_counter()
+    result = func(count)
+    seconds = time.perf_counter() - start
+    return {
+        "casts": count,
+        "seconds": seconds,
+        "casts_per_second": count / seconds if seconds else None,
+    }, result
+
+
+def _step_path(count, seed):
+    """逐步演算count次，返回爻值计数"""
+    rng = random.Random(seed)
+    dayan = DaYanShiFa()
+    counts = {}
+    for _ in range(count):
+        for v in dayan.simulate(rng):
+            counts[v] = counts.get(v, 0) + 1
+    return counts
+
+
+def _alias_path(count, seed):
+    """别名表抽样count次，返回爻值计数"""
+    rng = random.Random(seed)
+    counts = {}
+    for _ in range(count):
+        for v in sampler.fast_cast(rng):
+            counts[v] = counts.get(v, 0) + 1
+    return counts
+
+
+def _engine_path(count, seed):
+    """NumPy批量引擎起卦count次，返回爻值计数"""
+    import numpy as np
+    from dayanshifa.engine import cast_lines
+
+    values, frequency = np.unique(cast_lines(count * 6, seed), return_counts=True)
+    return dict(zip(values.tolist(), frequency.tolist()))
+
+
+def run(step_count=20000, bulk_count=1000000, seed=0, alpha=0.001):
+    """运行全部基准与校验，返回可JSON序列化的报告"""
+    exact = analysis.analyze(cache_dir=None)["lines"]
+    paths = [
+        ("step", _step_path, step_count),
+        ("alias", _alias_path, step_count),
+    ]
+    try:
+        import numpy
+        paths.append(("engine", _engine_path, bulk_count))
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+
+    report = {
+        "seed": seed,
+        "python": platform.python_version(),
+        "numpy": numpy_version,
+        "expected": {
+            "exact": {str(v): float(p) for v, p in exact.items()},
+            "classical": {str(v): p for v, p in CLASSICAL_DISTRIBUTION.items()},
+        },
+        "paths": {},
+    }
+    for name, func, count in paths:
+        timing, counts = _measure(lambda n: func(n, seed), count)
+        exact_check = check_distribution(counts, exact)
+        classical_check = check_distribution(counts, CLASSICAL_DISTRIBUTION)
+        del classical_check["frequencies"]
+        timing["exact"] = exact_check
+        timing["classical"] = classical_check
+        timing["passed"] = exact_check["p_value"] >= alpha
+        report["paths"][name] = timing
+    return report
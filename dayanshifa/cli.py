@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+大衍筮法命令行 - 无界面批量起卦
+用法: python -m dayanshifa cast --count 10000000 --format jsonl --output casts.jsonl
+      python -m dayanshifa bench --output bench.json
+      python -m dayanshifa export --history dayan_history --output history.csv.gz
+      python -m dayanshifa import backup.jsonl.gz --history dayan_history
+逐块生成、逐块写出，内存占用与数量无关；记录格式与界面历史记录一致
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+from dayanshifa.core import DATE_FORMAT, HISTORY_FIELDS, make_record
+from dayanshifa import sampler
+
+# 六爻组合序号：sum((爻值-6) * 4^爻位)，共4096种
+ROW_COUNT = 4096
+
+
+def _check_sizes(count, chunk_size):
+    """起卦次数须非负、每块记录数须为正，否则无法结束"""
+    if count < 0:
+        raise ValueError(f"起卦次数不能为负: {count}")
+    if chunk_size <= 0:
+        raise ValueError(f"每块记录数须为正: {chunk_size}")
+
+
+def _non_negative_int(text):
+    """命令行参数：非负整数"""
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"不能为负: {value}")
+    return value
+
+
+def _positive_int(text):
+    """命令行参数：正整数"""
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"须为正整数: {value}")
+    return value
+
+
+def _row_values(row):
+    """组合序号 → 六爻爻值"""
+    return [(row >> (2 * i) & 3) + 6 for i in range(6)]
+
+
+def _build_jsonl_tails():
+    """每种六爻组合对应的JSON记录后半段（自yao_values起）"""
+    tails = []
+    for row in range(ROW_COUNT):
+        record = make_record("", "", _row_values(row))
+        del record["question"], record["date"]
+        tails.append(json.dumps(record, ensure_ascii=False)[1:] + "\n")
+    return tails
+
+
+def _build_csv_tails():
+    """每种六爻组合对应的CSV行后半段（自yao_values起）"""
+    tails = []
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in range(ROW_COUNT):
+        record = make_record("", "", _row_values(row))
+        record["yao_values"] = ",".join(map(str, record["yao_values"]))
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([record[field] for field in HISTORY_FIELDS[2:]])
+        tails.append(buffer.getvalue())
+    return tails
+
+
+def iter_rows(count, chunk_size=65536, seed=None):
+    """逐块生成六爻组合序号，有NumPy时走向量化引擎，否则走别名表抽样"""
+    _check_sizes(count, chunk_size)
+    try:
+        import numpy as np
+        from dayanshifa.engine import cast_lines
+    except ImportError:
+        np = None
+
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        weights = np.array([1, 4, 16, 64, 256, 1024], dtype=np.int16)
+        while count > 0:
+            n = min(chunk_size, count)
+            yao = cast_lines(n * 6, rng).reshape(n, 6)
+            yield ((yao - 6) * weights).sum(axis=1).tolist()
+            count -= n
+    else:
+        import random
+        rng = random.Random(seed)
+        while count > 0:
+            n = min(chunk_size, count)
+            chunk = []
+            for _ in range(n):
+                row = 0
+                for i in range(6):
+                    row |= (sampler.draw_line(rng) - 6) << (2 * i)
+                chunk.append(row)
+            yield chunk
+            count -= n
+
+
+def write_casts(out, count, fmt="jsonl", question="", chunk_size=65536, seed=None):
+    """批量起卦并流式写出，返回写出的记录数"""
+    _check_sizes(count, chunk_size)
+    if fmt == "jsonl":
+        tails = _build_jsonl_tails()
+        quoted_question = json.dumps(question, ensure_ascii=False)
+    elif fmt == "csv":
+        tails = _build_csv_tails()
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="").writerow([question])
+        quoted_question = buffer.getvalue()
+        csv.writer(out, lineterminator="\n").writerow(HISTORY_FIELDS)
+    else:
+        raise ValueError(f"不支持的格式: {fmt}")
+
+    written = 0
+    for rows in iter_rows(count, chunk_size, seed):
+        date = datetime.now().strftime(DATE_FORMAT)
+        if fmt == "jsonl":
+            head = f'{{"question": {quoted_question}, "date": "{date}", '
+        else:
+            head = f"{quoted_question},{date},"
+        out.write("".join([head + tails[row] for row in rows]))
+        written += len(rows)
+    return written
+
+
+def cmd_cast(args):
+    """cast 子命令"""
+    if args.output and args.output != "-":
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write_casts(out, args.count, args.format, args.question, args.chunk_size, args.seed)
+    else:
+        write_casts(sys.stdout, args.count, args.format, args.question, args.chunk_size, args.seed)
+        sys.stdout.flush()
+    return 0
+
+
+def cmd_bench(args):
+    """bench 子命令"""
+    from dayanshifa import bench
+
+    report = bench.run(args.step_count, args.bulk_count, args.seed, args.alpha)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output and args.output != "-":
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if all(path["passed"] for path in report["paths"].values()) else 1
+
+
+def cmd_export(args):
+    """export 子命令"""
+    from dayanshifa import history_io
+
+    store = history_io.open_store(args.history)
+    fmt = args.format or history_io.detect_format(args.output)
+    count = history_io.export_history(store, args.output, fmt)
+    print(f"已导出 {count} 条记录", file=sys.stderr)
+    return 0
+
+
+def cmd_import(args):
+    """import 子命令"""
+    from dayanshifa import history_io
+
+    store = history_io.open_store(args.history)
+    imported, skipped = history_io.import_history(store, args.input, args.format)
+    print(f"已导入 {imported} 条记录，跳过重复或无效 {skipped} 条", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="python -m dayanshifa", description="大衍筮法命令行工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    cast_parser = subparsers.add_parser("cast", help="批量起卦并输出记录")
+    cast_parser.add_argument("--count", type=_non_negative_int, default=1, help="起卦次数")
+    cast_parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="输出格式")
+    cast_parser.add_argument("--output", "-o", default="-", help="输出文件，默认标准输出")
+    cast_parser.add_argument("--question", default="", help="求卦事项")
+    cast_parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    cast_parser.add_argument("--chunk-size", type=_positive_int, default=65536, help="每块生成的记录数")
+    cast_parser.set_defaults(func=cmd_cast)
+
+    bench_parser = subparsers.add_parser("bench", help="性能基准与分布校验（JSON输出）")
+    bench_parser.add_argument("--step-count", type=int, default=20000, help="逐步演算与别名表抽样的起卦次数")
+    bench_parser.add_argument("--bulk-count", type=int, default=1000000, help="批量引擎的起卦次数")
+    bench_parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    bench_parser.add_argument("--alpha", type=float, default=0.001, help="卡方检验显著性水平")
+    bench_parser.add_argument("--output", "-o", default="-", help="输出文件，默认标准输出")
+    bench_parser.set_defaults(func=cmd_bench)
+
+    export_parser = subparsers.add_parser("export", help="导出历史记录（JSONL/CSV，.gz 压缩）")
+    export_parser.add_argument("--history", default="dayan_history", help="历史存储（分段目录、.jsonl 或 .db）")
+    export_parser.add_argument("--output", "-o", default="-", help="输出文件，默认标准输出")
+    export_parser.add_argument("--format", choices=("jsonl", "csv"), default=None, help="输出格式，默认按扩展名")
+    export_parser.set_defaults(func=cmd_export)
+
+    import_parser = subparsers.add_parser("import", help="导入历史记录并去重（JSONL/CSV，.gz 压缩）")
+    import_parser.add_argument("input", help="输入文件，- 表示标准输入")
+    import_parser.add_argument("--history", default="dayan_history", help="历史存储（分段目录、.jsonl 或 .db）")
+    import_parser.add_argument("--format", choices=("jsonl", "csv"), default=None, help="输入格式，默认按扩展名")
+    import_parser.set_defaults(func=cmd_import)
+
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        return 0
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+大衍筮法核心逻辑 - 不依赖界面
+卦表与逐步演算状态机，供Kivy界面与批量引擎共用
+"""
+
+import random
+
+from dayanshifa.relations import COMPLEMENT, NUCLEAR, REVERSED
+
+# 六十四卦数据（键为二进制爻序，首字符为初爻；字典顺序即通行卦序）
+HEXAGRAMS = {
+    "111111": ("乾", "天"), "000000": ("坤", "地"), "100010": ("屯", "水雷"),
+    "010001": ("蒙", "山水"), "111010": ("需", "水天"), "010111": ("讼", "天水"),
+    "010000": ("师", "地水"), "000010": ("比", "水地"), "111011": ("小畜", "风天"),
+    "110111": ("履", "天泽"), "111000": ("泰", "地天"), "000111": ("否", "天地"),
+    "101111": ("同人", "天火"), "111101": ("大有", "火天"), "001000": ("谦", "地山"),
+    "000100": ("豫", "雷地"), "100110": ("随", "泽雷"), "011001": ("蛊", "山风"),
+    "110000": ("临", "地泽"), "000011": ("观", "风地"), "100101": ("噬嗑", "火雷"),
+    "101001": ("贲", "山火"), "000001": ("剥", "山地"), "100000": ("复", "地雷"),
+    "100111": ("无妄", "天雷"), "111001": ("大畜", "山天"), "100001": ("颐", "山雷"),
+    "011110": ("大过", "泽风"), "010010": ("坎", "水"), "101101": ("离", "火"),
+    "001110": ("咸", "泽山"), "011100": ("恒", "雷风"), "001111": ("遁", "天山"),
+    "111100": ("大壮", "雷天"), "000101": ("晋", "火地"), "101000": ("明夷", "地火"),
+    "101011": ("家人", "风火"), "110101": ("睽", "火泽"), "001010": ("蹇", "水山"),
+    "010100": ("解", "雷水"), "110001": ("损", "山泽"), "100011": ("益", "风雷"),
+    "111110": ("夬", "泽天"), "011111": ("姤", "天风"), "000110": ("萃", "泽地"),
+    "011000": ("升", "地风"), "010110": ("困", "泽水"), "011010": ("井", "水风"),
+    "101110": ("革", "泽火"), "011101": ("鼎", "火风"), "100100": ("震", "雷"),
+    "001001": ("艮", "山"), "001011": ("渐", "风山"), "110100": ("归妹", "雷泽"),
+    "101100": ("丰", "雷火"), "001101": ("旅", "火山"), "011011": ("巽", "风"),
+    "110110": ("兑", "泽"), "010011": ("涣", "风水"), "110010": ("节", "水泽"),
+    "001100": ("中孚", "风泽"), "110011": ("小过", "雷山"), "010101": ("既济", "水火"),
+    "101010": ("未济", "火水"),
+}
+
+# 卦序（下标即卦序，从0开始）到卦键
+HEXAGRAM_KEYS = tuple(HEXAGRAMS)
+
+
+def key_to_code(key):
+    """卦键 → 6位卦码（初爻为最低位）"""
+    return int(key[::-1], 2)
+
+
+def code_to_key(code):
+    """6位卦码 → 卦键"""
+    return format(code, "06b")[::-1]
+
+
+# 卦码 → (卦名, 卦象, 卦键)
+HEXAGRAM_TABLE = tuple(HEXAGRAMS[code_to_key(code)] + (code_to_key(code),) for code in range(64))
+
+# 卦码 → 卦序
+HEXAGRAM_INDEX = tuple(HEXAGRAM_KEYS.index(code_to_key(code)) for code in range(64))
+
+# 卦码 → 六爻符号（初爻在前）
+HEXAGRAM_SYMBOLS = tuple(
+    tuple("⚊" if code >> i & 1 else "⚋" for i in range(6)) for code in range(64)
+)
+
+# 爻值 → (本卦阴阳位, 变爻位)
+_YAO_BITS = {6: (0, 1), 7: (1, 0), 8: (0, 0), 9: (1, 1)}
+
+
+def encode_yao_values(yao_values):
+    """一次遍历求 (本卦码, 之卦码, 变爻掩码)，爻值无效时返回None"""
+    if len(yao_values) != 6:
+        return None
+
+    original = 0
+    moving_mask = 0
+    for i, v in enumerate(yao_values):
+        bits = _YAO_BITS.get(v)
+        if bits is None:
+            return None
+        original |= bits[0] << i
+        moving_mask |= bits[1] << i
+    return original, original ^ moving_mask, moving_mask
+
+
+# 历史记录日期格式
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 历史记录字段（界面保存与批量导出共用）
+HISTORY_FIELDS = (
+    "question", "date", "yao_values",
+    "original_name", "original_xiang", "original_symbols",
+    "changed_name", "changed_xiang", "changed_symbols",
+)
+
+
+def make_record(question, date, yao_values):
+    """生成一条历史记录，无变爻时之卦字段为空字符串"""
+    record = {
+        "question": question,
+        "date": date,
+        "yao_values": list(yao_values),
+        "original_name": "",
+        "original_xiang": "",
+        "original_symbols": "",
+        "changed_name": "",
+        "changed_xiang": "",
+        "changed_symbols": "",
+    }
+
+    codes = encode_yao_values(yao_values)
+    if codes is None:
+        return record
+
+    original, changed, moving_mask = codes
+    record["original_name"], record["original_xiang"], _ = HEXAGRAM_TABLE[original]
+    record["original_symbols"] = "".join(HEXAGRAM_SYMBOLS[original])
+    if moving_mask:
+        record["changed_name"], record["changed_xiang"], _ = HEXAGRAM_TABLE[changed]
+        record["changed_symbols"] = "".join(HEXAGRAM_SYMBOLS[changed])
+    return record
+
+
+class DaYanShiFa:
+    """大衍筮法核心逻辑类"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """重置状态"""
+        self.total_straws = 50
+        self.working_straws = 49
+        self.current_yao = 0
+        self.current_bian = 0
+        self.yao_values = []
+        self.bian_remainders = []
+        self.step = "init"
+        self.left_pile = 0
+        self.right_pile = 0
+        self.ren_straw = 0
+        self.left_remainder = 0
+        self.right_remainder = 0
+        self.current_straw_count = 49
+
+    @staticmethod
+    def get_remainder(pile_count):
+        """揲四求余（整除时余数记4，空堆余数为0）"""
+        if pile_count == 0:
+            return 0
+        remainder = pile_count % 4
+        if remainder == 0:
+            remainder = 4
+        return remainder
+
+    def divide(self, left_count):
+        """分两仪：左堆至少1根，右堆至少1根"""
+        total = self.current_straw_count
+        if left_count < 1:
+            left_count = 1
+        elif left_count >= total:
+            left_count = total - 1
+
+        self.left_pile = left_count
+        self.right_pile = total - left_count
+        self.step = "take_ren"
+
+    def take_ren(self):
+        """挂一：从右堆取一根象征人"""
+        self.right_pile -= 1
+        self.ren_straw = 1
+        self.step = "count_left"
+
+    def count_left(self):
+        """揲四-左，右堆为0时直接归奇"""
+        self.left_remainder = self.get_remainder(self.left_pile)
+
+        if self.right_pile == 0:
+            self.right_remainder = 0
+            self._gui_qi()
+        else:
+            self.step = "count_right"
+        return self.left_remainder
+
+    def count_right(self):
+        """揲四-右并归奇"""
+        self.right_remainder = self.get_remainder(self.right_pile)
+        self._gui_qi()
+        return self.right_remainder
+
+    def _gui_qi(self):
+        """归奇：左余+右余+挂一放一旁"""
+        total_remainder = self.left_remainder + self.right_remainder + self.ren_straw
+        self.bian_remainders.append(total_remainder)
+        self.current_straw_count -= total_remainder
+        self.step = "complete_bian"
+
+    def complete_bian(self):
+        """完成一变，三变完成时返回所得爻值，否则返回None"""
+        self.current_bian += 1
+
+        if self.current_bian < 3:
+            self.step = "divide_piles"
+            return None
+
+        yao_value = self.current_straw_count // 4
+        self.yao_values.append(yao_value)
+        self.current_yao += 1
+
+        if self.current_yao < 6:
+            self.current_bian = 0
+            self.bian_remainders = []
+            self.current_straw_count = 49
+            self.step = "next_yao"
+        else:
+            self.step = "done"
+        return yao_value
+
+    def scene_state(self):
+        """当前画面状态（可JSON序列化），界面据此重绘
+
+        高亮数为0表示该堆尚未揲四；挂一为0表示尚未挂一
+        """
+        step = self.step
+        return {
+            "step": step,
+            "straw_count": self.current_straw_count,
+            "left_pile": self.left_pile,
+            "right_pile": self.right_pile,
+            "ren_straw": self.ren_straw if step in ("count_left", "count_right", "complete_bian", "next_yao") else 0,
+            "left_highlight": self.left_remainder if step in ("count_right", "complete_bian", "next_yao") else 0,
+            "right_highlight": self.right_remainder if step in ("complete_bian", "next_yao") else 0,
+            "yao_values": list(self.yao_values),
+        }
+
+    def simulate(self, rng=None):
+        """无界面完整起卦一次（逐步演算），返回六爻爻值"""
+        rng = rng or random
+        self.reset()
+        while self.current_yao < 6:
+            self.divide(rng.randint(1, self.current_straw_count - 1))
+            self.take_ren()
+            self.count_left()
+            if self.step == "count_right":
+                self.count_right()
+            self.complete_bian()
+        return list(self.yao_values)
+
+    def fast_cast(self, rng=None):
+        """快速起卦：按精确爻值分布直接抽样六爻，返回六爻爻值"""
+        from dayanshifa.sampler import fast_cast
+
+        self.reset()
+        self.yao_values = fast_cast(rng)
+        self.current_yao = 6
+        self.step = "done"
+        return list(self.yao_values)
+
+    def get_yao_symbol(self, value, for_original=True):
+        """获取爻的符号"""
+        if value == 6:
+            return "⚋" if for_original else "⚊"
+        elif value == 7:
+            return "⚊"
+        elif value == 8:
+            return "⚋"
+        elif value == 9:
+            return "⚊" if for_original else "⚋"
+        return ""
+
+    def get_binary(self, value, for_original=True):
+        """获取爻的二进制值"""
+        if value == 6:
+            return "0" if for_original else "1"
+        elif value == 7:
+            return "1"
+        elif value == 8:
+            return "0"
+        elif value == 9:
+            return "1" if for_original else "0"
+        return ""
+
+    def get_hexagram_by_code(self, code):
+        """根据卦码获取卦象信息"""
+        name, xiang, binary = HEXAGRAM_TABLE[code]
+        return {
+            "name": name,
+            "xiang": xiang,
+            "symbols": list(HEXAGRAM_SYMBOLS[code]),
+            "binary": binary,
+            "code": code
+        }
+
+    def get_hexagram_info(self, yao_values, for_original=True):
+        """根据爻值获取卦象信息"""
+        codes = encode_yao_values(yao_values)
+        if codes is None:
+            return None
+        return self.get_hexagram_by_code(codes[0] if for_original else codes[1])
+
+    def get_result(self, yao_values):
+        """一次求出本卦与之卦信息，无变爻时之卦为None"""
+        codes = encode_yao_values(yao_values)
+        if codes is None:
+            return None, None
+
+        original, changed, moving_mask = codes
+        changed_info = self.get_hexagram_by_code(changed) if moving_mask else None
+        return self.get_hexagram_by_code(original), changed_info
+
+    def get_related_hexagrams(self, code):
+        """获取互卦、错卦、综卦信息"""
+        return {
+            "nuclear": self.get_hexagram_by_code(NUCLEAR[code]),
+            "complement": self.get_hexagram_by_code(COMPLEMENT[code]),
+            "reversed": self.get_hexagram_by_code(REVERSED[code]),
+        }
+
+    def has_bian_yao(self, yao_values):
+        """检查是否有变爻"""
+        return any(v in [6, 9] for v in yao_values)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+大衍筮法批量起卦引擎 - 无界面，基于NumPy向量化
+演算规则与 DaYanShiFa 的逐步演算完全一致：
+分两仪（左堆1..n-1）→ 挂一（取自右堆）→ 揲四（余0记4，空堆记0）→ 归奇，
+三变成一爻，六爻成一卦
+"""
+
+import numpy as np
+
+from dayanshifa.batch import INDICES, classify
+
+
+def cast_lines(count, rng=None):
+    """批量求爻，返回count个爻值（6/7/8/9）"""
+    rng = np.random.default_rng(rng)
+    straws = np.full(count, 49, dtype=np.int16)
+
+    for _ in range(3):
+        # 分两仪
+        left = rng.integers(1, straws, dtype=np.int16)
+        # 挂一
+        right = straws - left - 1
+        # 揲四
+        left_remainder = (left - 1) % 4 + 1
+        right_remainder = np.where(right > 0, (right - 1) % 4 + 1, 0)
+        # 归奇
+        straws -= left_remainder + right_remainder + 1
+
+    return (straws // 4).astype(np.int8)
+
+
+def cast(count, rng=None):
+    """批量起卦
+
+    返回字典：
+      yao_values: (count, 6) 爻值数组，第0列为初爻
+      original:   本卦卦序（下标对应 HEXAGRAM_KEYS）
+      changed:    之卦卦序，无变爻时为-1
+    """
+    yao_values = cast_lines(count * 6, rng).reshape(count, 6)
+    codes = classify(yao_values)
+
+    original = INDICES[codes["original"]]
+    changed = np.where(codes["moving_mask"] > 0, INDICES[codes["changed"]], -1).astype(np.int8)
+
+    return {
+        "yao_values": yao_values,
+        "original": original,
+        "changed": changed,
+    }
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+历史记录存储 - 追加写入的JSONL日志
+每次起卦只追加一行并fsync，保存开销与历史条数无关；
+整体重写（压缩）时先写临时文件再原子改名，中途崩溃不会丢失已有记录；
+HistoryWriter 在后台线程中合并写入，界面线程不等待磁盘
+"""
+
+import json
+import os
+import queue
+import threading
+
+
+def _fsync_dir(path):
+    """同步目录项，确保改名落盘（不支持时忽略）"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, lines):
+    """把若干行写入临时文件后原子替换path"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+
+def dump_record(record):
+    """一条记录（字典或紧凑记录）→ 一行JSON"""
+    if not isinstance(record, dict):
+        record = record.to_dict()
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class JsonlHistoryStore:
+    """JSONL历史记录存储（每行一条记录）"""
+
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        # 旧版整体JSON数组文件，首次加载时自动迁移
+        self.legacy_path = legacy_path
+
+    def migrate_legacy(self):
+        """旧版JSON数组文件 → JSONL，成功后旧文件改名为 .bak"""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return False
+        if os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(records, list):
+            return False
+
+        write_atomic(self.path, (dump_record(r) for r in records))
+        os.replace(self.legacy_path, self.legacy_path + ".bak")
+        return True
+
+    def prepare(self):
+        """加载前的准备：迁移旧版文件，截掉上次崩溃时写了一半的最后一行
+
+        只读文件末尾，开销与历史条数无关；须在开始追加新记录之前调用
+        """
+        self.migrate_legacy()
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            valid_end = size
+            while valid_end > 0:
+                block_start = max(valid_end - 4096, 0)
+                f.seek(block_start)
+                block = f.read(valid_end - block_start)
+                newline = block.rfind(b"\n")
+                if newline >= 0:
+                    valid_end = block_start + newline + 1
+                    break
+                valid_end = block_start
+            if valid_end < size:
+                f.truncate(valid_end)
+
+    def load(self):
+        """加载全部记录"""
+        self.prepare()
+        records = []
+        for chunk in self.iter_chunks():
+            records.extend(chunk)
+        return records
+
+    def iter_chunks(self, chunk_size=500, end=None):
+        """逐块流式解析记录
+
+        只读取调用时文件中已有的完整行（给出end时只读前end字节），可与后台追加写入同时进行
+        """
+        if not os.path.exists(self.path):
+            return
+
+        if end is None:
+            end = os.path.getsize(self.path)
+        position = 0
+        chunk = []
+        with open(self.path, "rb") as f:
+            for line in f:
+                position += len(line)
+                if position > end or not line.endswith(b"\n"):
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    chunk.append(json.loads(line))
+                except ValueError:
+                    continue
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def append(self, record):
+        """追加一条记录"""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """追加多条记录，一次写入一次fsync"""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(dump_record(r) for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self, records):
+        """以records整体重写日志（原子替换）"""
+        write_atomic(self.path, (dump_record(r) for r in records))
+
+
+class HistoryWriter:
+    """后台历史写入线程
+
+    记录先进入有界队列，队列满时暂存到溢出列表，写入线程每次把积压的记录
+    合并为一次append_many，调用方（界面线程）从不等待磁盘；写入失败时调用
+    on_error(异常)，该回调在写入线程中执行
+    """
+
+    _STOP = object()
+
+    def __init__(self, store, on_error=None, maxsize=1024):
+        self.store = store
+        self.on_error = on_error
+        self._queue = queue.Queue(maxsize)
+        # 队列满时提交的记录，由写入线程随下一批一起写出
+        self._overflow = []
+        self._overflow_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """提交一条待写入的记录（不阻塞）"""
+        with self._overflow_lock:
+            # 已有溢出记录时继续排在其后，保持写入顺序
+            if not self._overflow:
+                try:
+                    self._queue.put_nowait(record)
+                    return
+                except queue.Full:
+                    pass
+            self._overflow.append(record)
+
+    def flush(self):
+        """等待已提交的记录全部写完"""
+        self._queue.join()
+
+    def close(self):
+        """写完剩余记录后结束写入线程"""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _run(self):
+        """写入线程主循环"""
+        while True:
+            item = self._queue.get()
+            batch = []
+            stop = item is self._STOP
+            if not stop:
+                batch.append(item)
+            taken = 1
+
+            # 合并同一时间段内积压的记录
+            while not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is self._STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            with self._overflow_lock:
+                batch.extend(self._overflow)
+                self._overflow = []
+
+            try:
+                if batch:
+                    self.store.append_many(batch)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+
+            if stop:
+                return
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+历史记录存储 - 内存映射的定长二进制格式（用于大型归档）
+
+文件结构（小端）：
+  文件头 24字节: 魔数 b"DYHB" | 版本 u16 | 保留 u16 | 记录数 u64 | 字符串表偏移 u64
+  记录区 每条20字节: 时间戳 i64 | 打包爻值 u32 | 事项偏移 u32 | 事项长度 u32
+  字符串表: 求卦事项的UTF-8字节，相同事项只存一份
+
+通过mmap读取，打开百万条的文件无需解析，按下标随机访问为O(1)；
+可与JSON/JSONL无损互转
+"""
+
+import json
+import mmap
+import os
+import struct
+
+from dayanshifa.history import JsonlHistoryStore, dump_record, write_atomic
+from dayanshifa.records import HistoryRecord
+
+MAGIC = b"DYHB"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHQQ")
+_RECORD = struct.Struct("<qIII")
+
+
+def write_binary(path, records):
+    """把记录（字典或紧凑记录）写成二进制文件（临时文件+原子改名）"""
+    strings = bytearray()
+    offsets = {}
+    count = 0
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        for record in records:
+            if isinstance(record, dict):
+                record = HistoryRecord.from_dict(record)
+                if isinstance(record, dict):
+                    raise ValueError(f"记录无法无损写入二进制格式: {record!r}")
+
+            question = record.question
+            if question not in offsets:
+                offsets[question] = (len(strings), len(question.encode("utf-8")))
+                strings += question.encode("utf-8")
+            offset, length = offsets[question]
+            f.write(_RECORD.pack(record.timestamp, record.packed, offset, length))
+            count += 1
+
+        string_offset = f.tell()
+        f.write(strings)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, count, string_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class BinaryHistory:
+    """只读的二进制历史记录，按下标O(1)访问"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"不是有效的二进制历史文件: {path}")
+
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"不是有效的二进制历史文件: {path}")
+        magic, version, _, self._count, self._string_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"不是有效的二进制历史文件: {path}")
+
+    def close(self):
+        """关闭文件"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+
+        timestamp, packed, offset, length = _RECORD.unpack_from(
+            self._map, _HEADER.size + index * _RECORD.size)
+        start = self._string_offset + offset
+        question = self._map[start:start + length].decode("utf-8")
+        return HistoryRecord(question, timestamp, packed)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+
+class BinaryHistoryStore:
+    """二进制格式的历史存储，与 JsonlHistoryStore 的 load/compact 对应"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """加载全部记录"""
+        if not os.path.exists(self.path):
+            return []
+        with BinaryHistory(self.path) as history:
+            return list(history)
+
+    def iter_chunks(self, chunk_size=500):
+        """逐块读取记录"""
+        if not os.path.exists(self.path):
+            return
+        with BinaryHistory(self.path) as history:
+            for start in range(0, len(history), chunk_size):
+                yield [history[i] for i in range(start, min(start + chunk_size, len(history)))]
+
+    def compact(self, records):
+        """以records整体重写文件"""
+        write_binary(self.path, records)
+
+
+def _iter_json_records(path):
+    """逐条读取JSON数组或JSONL文件中的记录"""
+    if path.endswith(".jsonl"):
+        for chunk in JsonlHistoryStore(path).iter_chunks():
+            yield from chunk
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def json_to_binary(json_path, binary_path):
+    """JSON/JSONL → 二进制"""
+    write_binary(binary_path, _iter_json_records(json_path))
+
+
+def binary_to_json(binary_path, json_path):
+    """二进制 → JSON/JSONL（按扩展名，.jsonl 为逐行格式，否则为旧版JSON数组）"""
+    with BinaryHistory(binary_path) as history:
+        if json_path.endswith(".jsonl"):
+            write_atomic(json_path, (dump_record(r) for r in history))
+        else:
+            write_atomic(json_path, [json.dumps([r.to_dict() for r in history], ensure_ascii=False, indent=2)])
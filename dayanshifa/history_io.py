@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+历史记录的流式导入导出
+支持JSONL、CSV及其gzip压缩版本（扩展名加 .gz），逐条读写，内存占用与文件大小无关；
+导入时跳过无效记录，并按（起卦时间, 求卦事项, 爻值）去重，集合中只保存每条记录的哈希值
+"""
+
+import contextlib
+import csv
+import gzip
+import json
+import sys
+from datetime import datetime
+
+from dayanshifa.core import DATE_FORMAT, HISTORY_FIELDS, encode_yao_values, make_record
+from dayanshifa.history import JsonlHistoryStore, dump_record
+
+FORMATS = ("jsonl", "csv")
+
+
+def detect_format(path):
+    """由扩展名判断格式（忽略 .gz），无法判断时为jsonl"""
+    if path.endswith(".gz"):
+        path = path[:-3]
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def open_text(path, mode="r"):
+    """打开文本文件，.gz 自动解压/压缩，"-" 表示标准输入/输出"""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def open_store(path):
+    """按路径打开历史存储：.jsonl 单文件、.db/.sqlite SQLite，其余为分段目录"""
+    if path.endswith(".jsonl"):
+        store = JsonlHistoryStore(path)
+    elif path.endswith((".db", ".sqlite")):
+        from dayanshifa.history_sqlite import SqliteHistoryStore
+        return SqliteHistoryStore(path)
+    else:
+        from dayanshifa.history_segments import SegmentedHistoryStore
+        store = SegmentedHistoryStore(path)
+    store.prepare()
+    return store
+
+
+def iter_jsonl(f):
+    """逐条读取JSONL记录（跳过空行、无法解析的行与非对象的行）"""
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            yield record
+
+
+def iter_csv(f):
+    """逐条读取CSV记录（表头为记录字段，yao_values 为逗号分隔的爻值）"""
+    for row in csv.DictReader(f):
+        try:
+            record = {field: row[field] or "" for field in HISTORY_FIELDS}
+            record["yao_values"] = [int(v) for v in record["yao_values"].split(",") if v]
+        except (KeyError, ValueError):
+            continue
+        yield record
+
+
+def iter_file(path, fmt=None):
+    """逐条读取文件中的记录"""
+    fmt = fmt or detect_format(path)
+    with open_text(path) as f:
+        if fmt == "csv":
+            yield from iter_csv(f)
+        else:
+            yield from iter_jsonl(f)
+
+
+def write_records(out, records, fmt="jsonl"):
+    """把记录流式写入out，返回写出的条数"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}")
+
+    count = 0
+    if fmt == "jsonl":
+        for record in records:
+            out.write(dump_record(record))
+            count += 1
+        return count
+
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(HISTORY_FIELDS)
+    for record in records:
+        if not isinstance(record, dict):
+            record = record.to_dict()
+        row = [record.get(field, "") for field in HISTORY_FIELDS]
+        row[2] = ",".join(str(v) for v in row[2])
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def iter_store(store):
+    """逐条读取存储中的全部记录"""
+    for chunk in store.iter_chunks():
+        yield from chunk
+
+
+def validate_record(record):
+    """校验导入的记录：起卦时间须符合DATE_FORMAT、六爻须有效，缺少派生字段时按爻值补全
+
+    无效时返回None
+    """
+    date = record.get("date")
+    question = record.get("question", "")
+    yao_values = record.get("yao_values")
+    if not isinstance(date, str) or not isinstance(question, str):
+        return None
+    try:
+        datetime.strptime(date, DATE_FORMAT)
+    except ValueError:
+        return None
+    if not isinstance(yao_values, list) or not all(type(v) is int for v in yao_values):
+        return None
+    if encode_yao_values(yao_values) is None:
+        return None
+    if any(field not in record for field in HISTORY_FIELDS):
+        return make_record(question, date, yao_values)
+    return record
+
+
+def record_key(record):
+    """去重键的哈希值：（起卦时间, 求卦事项, 爻值）"""
+    return hash((record.get("date", ""), record.get("question", ""), tuple(record.get("yao_values", []))))
+
+
+def export_history(store, path, fmt=None):
+    """把存储中的历史导出到文件，返回导出的条数"""
+    fmt = fmt or detect_format(path)
+    with open_text(path, "w") as out:
+        return write_records(out, iter_store(store), fmt)
+
+
+def import_history(store, path, fmt=None, chunk_size=500):
+    """从文件导入历史，跳过无效记录及与已有记录或文件内重复的记录，返回(导入条数, 跳过条数)
+
+    存储支持 insert_many（分段存储）时按日期插入，保持按时间顺序读取；否则追加在末尾
+    """
+    insert = getattr(store, "insert_many", store.append_many)
+    seen = {record_key(r) for r in iter_store(store)}
+    imported = skipped = 0
+    batch = []
+    for record in iter_file(path, fmt):
+        record = validate_record(record)
+        if record is None:
+            skipped += 1
+            continue
+        key = record_key(record)
+        if key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+        batch.append(record)
+        if len(batch) >= chunk_size:
+            insert(batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        insert(batch)
+        imported += len(batch)
+    return imported, skipped
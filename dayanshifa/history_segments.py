@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+"""
+历史记录存储 - 按月/按大小分段的JSONL
+记录只追加到当前段，跨月或超过大小上限时新开一段；
+index.json 记录各段的文件名、日期范围、条数与大小，按日期范围查询时只打开相关的段；
+compact_segments 合并过小的段，并把旧段gzip归档，可在后台线程中运行
+"""
+
+import gzip
+import heapq
+import json
+import os
+import threading
+from datetime import datetime
+
+from dayanshifa.core import DATE_FORMAT
+from dayanshifa.history import JsonlHistoryStore, dump_record, write_atomic
+
+INDEX_VERSION = 1
+
+# 单段大小上限（字节）
+MAX_SEGMENT_BYTES = 1024 * 1024
+# 小于此大小的相邻段在压缩时合并
+MIN_SEGMENT_BYTES = 64 * 1024
+# 日期无法解析的记录归入的月份
+UNKNOWN_MONTH = "unknown"
+
+
+def _month(record):
+    """记录所属的月份（YYYY-MM），只取自能按DATE_FORMAT解析的日期，其余归入UNKNOWN_MONTH"""
+    date = record.get("date", "")
+    try:
+        datetime.strptime(date, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return UNKNOWN_MONTH
+    return date[:7]
+
+
+def _read_segment(path, chunk_size, end=None):
+    """逐块读取一个段（未归档段只读前end字节中的完整行，归档段为gzip）"""
+    if not path.endswith(".gz"):
+        yield from JsonlHistoryStore(path).iter_chunks(chunk_size, end)
+        return
+
+    chunk = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                chunk.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class SegmentedHistoryStore:
+    """分段历史记录存储，接口与 JsonlHistoryStore 相同（prepare/iter_chunks/append_many/compact），另有按日期插入的 insert_many"""
+
+    def __init__(self, directory, legacy_store=None, max_segment_bytes=MAX_SEGMENT_BYTES):
+        self.directory = directory
+        # 旧版单文件存储（JsonlHistoryStore），首次使用时自动迁移
+        self.legacy_store = legacy_store
+        self.max_segment_bytes = max_segment_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.RLock()
+        self._segments = []
+        self._next_id = 0
+        # 旧版历史迁移进行中（中断后下次启动时重新迁移）
+        self._migrating = False
+        self._prepared = False
+
+    def _path(self, segment):
+        """段文件路径"""
+        return os.path.join(self.directory, segment["name"])
+
+    def _new_segment(self, month, archived=False):
+        """分配一个新段（文件名不与已有段及写入后未及记入索引的文件重复）"""
+        while True:
+            name = f"{month}.{self._next_id:06d}.jsonl" + (".gz" if archived else "")
+            self._next_id += 1
+            if not os.path.exists(os.path.join(self.directory, name)):
+                break
+        return {"name": name, "start": None, "end": None, "count": 0, "bytes": 0, "archived": archived}
+
+    def _save_index(self):
+        """原子写入段索引"""
+        write_atomic(self.index_path, [json.dumps(
+            {"version": INDEX_VERSION, "next_id": self._next_id, "migrating": self._migrating,
+             "segments": self._segments},
+            ensure_ascii=False, indent=2)])
+
+    def _rescan(self, segment):
+        """重新统计一个段的条数与日期范围"""
+        segment.update(start=None, end=None, count=0)
+        for chunk in _read_segment(self._path(segment), 500):
+            for record in chunk:
+                self._extend_range(segment, record)
+        segment["bytes"] = os.path.getsize(self._path(segment))
+
+    @staticmethod
+    def _extend_range(segment, record):
+        """把一条记录计入段的日期范围与条数"""
+        date = record.get("date", "")
+        if segment["start"] is None or date < segment["start"]:
+            segment["start"] = date
+        if segment["end"] is None or date > segment["end"]:
+            segment["end"] = date
+        segment["count"] += 1
+
+    def _read_index(self):
+        """读取段索引，不存在、损坏或版本不符时返回None"""
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+            return None
+        return index
+
+    def repair(self):
+        """只截掉当前段上次崩溃时写了一半的最后一行
+
+        只读索引与当前段末尾，开销与历史条数无关，可在启动时同步调用；
+        索引重建、旧版历史迁移等留给 prepare
+        """
+        with self._lock:
+            index = self._read_index()
+            if not index or not index["segments"]:
+                return
+            segment = index["segments"][-1]
+            path = self._path(segment)
+            if not segment["archived"] and os.path.exists(path):
+                JsonlHistoryStore(path).prepare()
+
+    def prepare(self):
+        """加载前的准备：读取（或重建）索引，修复残缺的末行，迁移旧版单文件历史
+
+        开销可能与历史条数成正比，宜在后台线程中调用；追加记录前未调用时由 append_many 自动调用
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            index = self._read_index()
+            if index:
+                self._segments = index["segments"]
+                self._next_id = index["next_id"]
+                self._migrating = index.get("migrating", False)
+            else:
+                self._rebuild_index()
+
+            # 追加后、写索引前中断时，按实际文件修正索引（只涉及未归档的段）
+            changed = False
+            for segment in self._segments:
+                if segment["archived"]:
+                    continue
+                path = self._path(segment)
+                if not os.path.exists(path):
+                    continue
+                JsonlHistoryStore(path).prepare()
+                if os.path.getsize(path) != segment["bytes"]:
+                    self._rescan(segment)
+                    changed = True
+            if changed:
+                self._save_index()
+
+            self._migrate_legacy()
+            self._prepared = True
+
+    def _rebuild_index(self):
+        """索引缺失或损坏时由目录中的段文件重建（各段按起始日期排序）"""
+        self._segments = []
+        self._next_id = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith((".jsonl", ".jsonl.gz")):
+                continue
+            segment = {"name": name, "start": None, "end": None, "count": 0, "bytes": 0,
+                       "archived": name.endswith(".gz")}
+            self._rescan(segment)
+            self._segments.append(segment)
+            try:
+                self._next_id = max(self._next_id, int(name.split(".")[1]) + 1)
+            except (IndexError, ValueError):
+                pass
+        self._segments.sort(key=lambda s: (s["start"] or "", s["name"].split(".")[:2]))
+        self._save_index()
+
+    def _migrate_legacy(self):
+        """旧版单文件历史 → 分段，全部写完后才把旧文件改名为 .bak
+
+        迁移开始时在索引中标记，中途中断时下次启动丢弃已迁移的段并重新迁移
+        """
+        legacy = self.legacy_store
+        if legacy is None:
+            return
+        if self._migrating:
+            for segment in self._segments:
+                if os.path.exists(self._path(segment)):
+                    os.remove(self._path(segment))
+            self._segments = []
+        elif self._segments:
+            return
+
+        legacy.prepare()
+        if not os.path.exists(legacy.path):
+            if self._migrating:
+                self._migrating = False
+                self._save_index()
+            return
+
+        self._migrating = True
+        self._save_index()
+        for chunk in legacy.iter_chunks():
+            self._append_many(chunk)
+        self._migrating = False
+        self._save_index()
+        os.replace(legacy.path, legacy.path + ".bak")
+
+    def load(self):
+        """加载全部记录"""
+        self.prepare()
+        records = []
+        for chunk in self.iter_chunks():
+            records.extend(chunk)
+        return records
+
+    def iter_chunks(self, chunk_size=500):
+        """按时间顺序逐块读取全部段"""
+        return self.query(chunk_size=chunk_size)
+
+    def query(self, start=None, end=None, chunk_size=500):
+        """逐块读取日期在[start, end]内的记录，只打开日期范围相交的段
+
+        start、end为日期字符串（可只写前缀，如 "2024-05"）；
+        各段只读到调用时索引中的大小，之后追加的记录不会返回
+        """
+        with self._lock:
+            segments = [dict(s) for s in self._segments if s["count"]]
+        upper = end + "\uffff" if end else None
+
+        for segment in segments:
+            if start and segment["end"] < start:
+                continue
+            if upper and segment["start"] > upper:
+                continue
+            inside = ((not start or segment["start"] >= start)
+                      and (not upper or segment["end"] <= upper))
+            for chunk in _read_segment(self._path(segment), chunk_size, segment["bytes"]):
+                if not inside:
+                    chunk = [r for r in chunk
+                             if (not start or r.get("date", "") >= start)
+                             and (not upper or r.get("date", "") <= upper)]
+                if chunk:
+                    yield chunk
+
+    def append(self, record):
+        """追加一条记录"""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """追加多条记录（跨月或当前段过大时换新段），每段一次写入一次fsync
+
+        先在段信息的副本上规划，每段写入成功后才更新索引
+        """
+        with self._lock:
+            if not self._prepared:
+                self.prepare()
+            self._append_many(records)
+
+    def _append_many(self, records):
+        """append_many 的实现（调用方持锁）"""
+        groups = []
+        active = dict(self._segments[-1]) if self._segments else None
+        for record in records:
+            if not isinstance(record, dict):
+                record = record.to_dict()
+            month = _month(record)
+            if (active is None or active["archived"]
+                    or active["name"][:len(month)] != month
+                    or active["bytes"] >= self.max_segment_bytes):
+                active = self._new_segment(month)
+            line = dump_record(record)
+            active["bytes"] += len(line.encode("utf-8"))
+            self._extend_range(active, record)
+            if not groups or groups[-1][0] is not active:
+                groups.append((active, []))
+            groups[-1][1].append(line)
+
+        written = False
+        try:
+            for segment, lines in groups:
+                with open(self._path(segment), "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+                if self._segments and self._segments[-1]["name"] == segment["name"]:
+                    self._segments[-1] = segment
+                else:
+                    self._segments.append(segment)
+                written = True
+        finally:
+            if written:
+                self._save_index()
+
+    def _write_segments(self, records):
+        """把按时间顺序的records写成一组新段（跨月或过大时换段），返回新段信息"""
+        segments = []
+        lines = []
+        for record in records:
+            if not isinstance(record, dict):
+                record = record.to_dict()
+            line = dump_record(record)
+            month = _month(record)
+            segment = segments[-1] if segments else None
+            if (segment is None or segment["name"][:len(month)] != month
+                    or segment["bytes"] >= self.max_segment_bytes):
+                if segment is not None:
+                    write_atomic(self._path(segment), lines)
+                segment = self._new_segment(month)
+                segments.append(segment)
+                lines = []
+            lines.append(line)
+            segment["bytes"] += len(line.encode("utf-8"))
+            self._extend_range(segment, record)
+        if segments:
+            write_atomic(self._path(segments[-1]), lines)
+        return segments
+
+    def _iter_segments(self, segments):
+        """逐条读取若干段中的记录"""
+        for segment in segments:
+            for chunk in _read_segment(self._path(segment), 500, segment["bytes"]):
+                yield from chunk
+
+    def _remove_files(self, segments):
+        """删除已不在索引中的段文件"""
+        for segment in segments:
+            if os.path.exists(self._path(segment)):
+                os.remove(self._path(segment))
+
+    def compact(self, records):
+        """以records整体重写全部段"""
+        with self._lock:
+            old = self._segments
+            self._segments = self._write_segments(records)
+            self._save_index()
+            self._remove_files(old)
+
+    def insert_many(self, records):
+        """按日期插入多条记录（可早于已有记录），保持各段按时间顺序
+
+        全部不早于已有记录时直接追加；否则涉及的月份各自与新记录归并后整体重写，
+        开销与这些月份的大小成正比
+        """
+        records = sorted((r if isinstance(r, dict) else r.to_dict() for r in records),
+                         key=lambda r: r.get("date", ""))
+        if not records:
+            return
+        with self._lock:
+            if not self._prepared:
+                self.prepare()
+            last = max((s["end"] for s in self._segments if s["count"]), default=None)
+            if last is None or records[0].get("date", "") >= last:
+                self._append_many(records)
+                return
+
+            by_month = {}
+            for record in records:
+                by_month.setdefault(_month(record), []).append(record)
+            for month, new in sorted(by_month.items()):
+                old = [s for s in self._segments if s["name"].split(".")[0] == month]
+                if old:
+                    position = self._segments.index(old[0])
+                else:
+                    # 插在起始日期晚于新记录的第一段之前
+                    first = new[0].get("date", "")
+                    position = next((i for i, s in enumerate(self._segments)
+                                     if s["count"] and s["start"] > first), len(self._segments))
+                merged = heapq.merge(self._iter_segments(old), new, key=lambda r: r.get("date", ""))
+                segments = self._write_segments(merged)
+                rest = [s for s in self._segments if s not in old]
+                self._segments = rest[:position] + segments + rest[position:]
+                self._save_index()
+                self._remove_files(old)
+
+    def compact_segments(self, min_bytes=MIN_SEGMENT_BYTES, archive_before=None):
+        """合并相邻的小段，并把结束日期早于archive_before的段gzip归档
+
+        当前段（最后一段）不参与；持锁运行，期间的追加会等待，宜在后台线程中调用
+        """
+        with self._lock:
+            if len(self._segments) < 2:
+                return
+            active = self._segments[-1]
+            result = []
+            removed = []
+
+            # 合并：相邻未归档小段合并后不超过单段上限
+            for segment in self._segments[:-1]:
+                if not segment["count"]:
+                    removed.append(segment)
+                    continue
+                previous = result[-1] if result else None
+                if (previous is not None and not previous["archived"] and not segment["archived"]
+                        and previous["bytes"] < min_bytes and segment["bytes"] < min_bytes
+                        and previous["bytes"] + segment["bytes"] <= self.max_segment_bytes):
+                    merged = self._new_segment(previous["name"].split(".")[0])
+                    with open(self._path(merged) + ".tmp", "wb") as out:
+                        for source in (previous, segment):
+                            with open(self._path(source), "rb") as f:
+                                out.write(f.read())
+                        out.flush()
+                        os.fsync(out.fileno())
+                    os.replace(self._path(merged) + ".tmp", self._path(merged))
+                    merged.update(
+                        start=min(previous["start"], segment["start"]),
+                        end=max(previous["end"], segment["end"]),
+                        count=previous["count"] + segment["count"],
+                        bytes=previous["bytes"] + segment["bytes"],
+                    )
+                    removed.extend(s for s in (previous, segment) if s not in removed)
+                    result[-1] = merged
+                else:
+                    result.append(segment)
+
+            # 归档旧段
+            if archive_before:
+                for i, segment in enumerate(result):
+                    if segment["archived"] or segment["end"] >= archive_before:
+                        continue
+                    archived = self._new_segment(segment["name"].split(".")[0], archived=True)
+                    with open(self._path(segment), "rb") as f, \
+                            gzip.open(self._path(archived) + ".tmp", "wb") as out:
+                        out.write(f.read())
+                    os.replace(self._path(archived) + ".tmp", self._path(archived))
+                    archived.update(start=segment["start"], end=segment["end"], count=segment["count"],
+                                    bytes=os.path.getsize(self._path(archived)))
+                    removed.append(segment)
+                    result[i] = archived
+
+            result.append(active)
+            self._segments = result
+            self._save_index()
+            self._remove_files(removed)
+
+    def segments(self):
+        """各段信息的副本（文件名、日期范围、条数、大小、是否归档）"""
+        with self._lock:
+            return [dict(s) for s in self._segments]
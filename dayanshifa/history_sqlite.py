@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+历史记录存储 - SQLite后端
+按日期、本卦、之卦、变爻掩码建索引，求卦事项建全文索引（trigram），
+分页、按卦查询与关键词搜索在十万条以上仍保持快速；
+返回的记录字典与界面保存的格式一致
+"""
+
+import sqlite3
+import threading
+
+from dayanshifa.core import HEXAGRAM_TABLE, encode_yao_values, make_record
+
+# 卦名 → 卦码
+_NAME_TO_CODE = {entry[0]: code for code, entry in enumerate(HEXAGRAM_TABLE)}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS casts (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    question TEXT NOT NULL,
+    yao_values TEXT NOT NULL,
+    original_code INTEGER,
+    changed_code INTEGER,
+    moving_mask INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_casts_date ON casts(date, id);
+CREATE INDEX IF NOT EXISTS idx_casts_original ON casts(original_code, date);
+CREATE INDEX IF NOT EXISTS idx_casts_changed ON casts(changed_code, date);
+CREATE INDEX IF NOT EXISTS idx_casts_moving ON casts(moving_mask, date);
+"""
+
+# trigram分词可对中文做子串匹配（需SQLite 3.34+），不可用时退回LIKE扫描
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS casts_fts USING fts5(
+    question, content='casts', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS casts_ai AFTER INSERT ON casts BEGIN
+    INSERT INTO casts_fts(rowid, question) VALUES (new.id, new.question);
+END;
+CREATE TRIGGER IF NOT EXISTS casts_ad AFTER DELETE ON casts BEGIN
+    INSERT INTO casts_fts(casts_fts, rowid, question) VALUES ('delete', old.id, old.question);
+END;
+"""
+
+_COLUMNS = "question, date, yao_values"
+
+
+def _row_to_record(row):
+    """数据库行 → 记录字典"""
+    question, date, yao_values = row
+    return make_record(question, date, [int(v) for v in yao_values])
+
+
+def _record_to_row(record):
+    """记录字典 → 数据库行"""
+    yao_values = record.get("yao_values", [])
+    codes = encode_yao_values(yao_values)
+    if codes:
+        original, changed, moving_mask = codes
+        if not moving_mask:
+            changed = None
+    else:
+        original = changed = moving_mask = None
+    return (
+        record.get("date", ""),
+        record.get("question", ""),
+        "".join(str(v) for v in yao_values),
+        original,
+        changed,
+        moving_mask,
+    )
+
+
+class SqliteHistoryStore:
+    """SQLite历史记录存储"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self._conn.commit()
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql, params=()):
+        """执行查询并转换为记录字典"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_record(row) for row in rows]
+
+    def append(self, record):
+        """追加一条记录"""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """在一个事务中追加多条记录"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO casts (date, question, yao_values, original_code, changed_code, moving_mask) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (_record_to_row(r) for r in records),
+            )
+
+    def load(self):
+        """按写入顺序加载全部记录"""
+        return self._query(f"SELECT {_COLUMNS} FROM casts ORDER BY id")
+
+    def iter_chunks(self, chunk_size=500):
+        """按写入顺序逐块读取记录"""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, {_COLUMNS} FROM casts WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [_row_to_record(row[1:]) for row in rows]
+
+    def compact(self, records):
+        """以records整体替换全部记录"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM casts")
+            self._conn.executemany(
+                "INSERT INTO casts (date, question, yao_values, original_code, changed_code, moving_mask) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (_record_to_row(r) for r in records),
+            )
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def count(self):
+        """记录总数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM casts").fetchone()[0]
+
+    def page(self, offset=0, limit=50):
+        """按日期从新到旧分页"""
+        return self._query(
+            f"SELECT {_COLUMNS} FROM casts ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+
+    def by_hexagram(self, hexagram, changed=False, offset=0, limit=50):
+        """查询本卦（或之卦）为指定卦的记录，hexagram为卦名或卦码"""
+        code = _NAME_TO_CODE.get(hexagram, hexagram)
+        column = "changed_code" if changed else "original_code"
+        return self._query(
+            f"SELECT {_COLUMNS} FROM casts WHERE {column} = ? ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+            (code, limit, offset),
+        )
+
+    def by_moving_mask(self, moving_mask, offset=0, limit=50):
+        """查询变爻位置完全相同的记录（掩码初爻为最低位）"""
+        return self._query(
+            f"SELECT {_COLUMNS} FROM casts WHERE moving_mask = ? ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+            (moving_mask, limit, offset),
+        )
+
+    def search(self, keyword, offset=0, limit=50):
+        """按求卦事项关键词搜索"""
+        # trigram索引只能匹配三个字符以上的词，更短的用LIKE
+        if self.has_fts and len(keyword) >= 3:
+            phrase = '"' + keyword.replace('"', '""') + '"'
+            return self._query(
+                f"SELECT {_COLUMNS} FROM casts WHERE id IN "
+                "(SELECT rowid FROM casts_fts WHERE casts_fts MATCH ?) "
+                "ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+                (phrase, limit, offset),
+            )
+
+        pattern = "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return self._query(
+            f"SELECT {_COLUMNS} FROM casts WHERE question LIKE ? ESCAPE '\\' "
+            "ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+            (pattern, limit, offset),
+        )
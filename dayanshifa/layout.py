@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+蓍草布局 - 规则网格的几何与点击检测
+蓍草按固定间距排成一排或每行15根的堆，点中哪根、分堆位置都由下标算术直接求出，
+不逐根遍历；坐标单位为像素，由界面传入。
+scene_layout 按（画布位置与尺寸、蓍草根数、阶段）缓存整幅画面的几何，相同参数直接复用
+"""
+
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+# 堆中每行的蓍草根数
+PILE_ROW_SIZE = 15
+
+# 最多缓存的画面布局数
+LAYOUT_CACHE_SIZE = 64
+
+
+class RowLayout:
+    """一排等间距的蓍草"""
+
+    __slots__ = ("x", "y", "spacing", "straw_width", "straw_height", "count", "centers", "straw_rects")
+
+    def __init__(self, x, y, spacing, straw_width, straw_height, count):
+        self.x = x
+        self.y = y
+        self.spacing = spacing
+        self.straw_width = straw_width
+        self.straw_height = straw_height
+        self.count = count
+        # 各根中线的横坐标（升序），供二分求分堆位置
+        self.centers = array("d", (x + i * spacing + straw_width / 2 for i in range(count)))
+        self.straw_rects = tuple((x + i * spacing, y, straw_width, straw_height) for i in range(count))
+
+    @property
+    def width(self):
+        """整排的宽度"""
+        return self.count * self.spacing
+
+    def rects(self):
+        """各根蓍草的矩形((x, y, 宽, 高), ...)"""
+        return self.straw_rects
+
+    def index_at(self, px, py, slop=0):
+        """点(px, py)落在哪根蓍草上（右侧放宽slop），未点中返回-1"""
+        if self.count == 0 or not self.y <= py <= self.y + self.straw_height:
+            return -1
+        i = min(int((px - self.x) // self.spacing), self.count - 1)
+        if i >= 0 and px - (self.x + i * self.spacing) <= self.straw_width + slop:
+            return i
+        return -1
+
+    def split_count(self, px):
+        """在横坐标px处分开时左边的根数（中线在px左侧的蓍草数）"""
+        return bisect_left(self.centers, px)
+
+
+class PileLayout:
+    """一堆蓍草，每行PILE_ROW_SIZE根，逐行向下排列"""
+
+    __slots__ = ("x", "y", "spacing", "straw_width", "straw_height", "row_step", "straw_rects")
+
+    def __init__(self, x, y, spacing, straw_width, straw_height, row_gap, capacity=0):
+        self.x = x
+        self.y = y
+        self.spacing = spacing
+        self.straw_width = straw_width
+        self.straw_height = straw_height
+        self.row_step = straw_height + row_gap
+        # 预先算好前capacity根的矩形
+        self.straw_rects = tuple(self._rect(i) for i in range(capacity))
+
+    def _rect(self, i):
+        """第i根蓍草的矩形"""
+        row, col = divmod(i, PILE_ROW_SIZE)
+        return (self.x + col * self.spacing, self.y - row * self.row_step,
+                self.straw_width, self.straw_height)
+
+    def rects(self, start, stop):
+        """第start至stop-1根蓍草的矩形"""
+        if stop <= len(self.straw_rects):
+            return self.straw_rects[start:stop]
+        return [self._rect(i) for i in range(start, stop)]
+
+    def index_at(self, px, py, count, slop=0):
+        """点(px, py)落在堆中哪根蓍草上（堆共count根，右侧放宽slop），未点中返回-1"""
+        row = int((self.y + self.straw_height - py) // self.row_step)
+        if row < 0 or py < self.y - row * self.row_step:
+            return -1
+        # 该行最后一根的列号，末行可能不满
+        last = min(count - 1 - row * PILE_ROW_SIZE, PILE_ROW_SIZE - 1)
+        if last < 0:
+            return -1
+        col = min(int((px - self.x) // self.spacing), last)
+        if col >= 0 and px - (self.x + col * self.spacing) <= self.straw_width + slop:
+            return row * PILE_ROW_SIZE + col
+        return -1
+
+
+class SceneLayout:
+    """一幅画面的全部几何（只读，由 scene_layout 缓存复用）
+
+    taiji、ren 为太极与挂一蓍草的矩形；row 为一排蓍草（初始或待分堆）；
+    left_pile、right_pile 为两堆；result_lines[卦][行] 为 (阳爻矩形, 阴爻两段矩形)，
+    卦0为本卦、1为之卦，行0为上爻
+    """
+
+    __slots__ = ("taiji", "ren", "row", "left_pile", "right_pile", "result_lines")
+
+    def __init__(self):
+        self.taiji = None
+        self.ren = None
+        self.row = None
+        self.left_pile = None
+        self.right_pile = None
+        self.result_lines = None
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def scene_layout(x, y, width, height, count, phase, unit=1.0):
+    """计算画面几何，按参数缓存，最久未用的先淘汰
+
+    x, y, width, height 为画布位置与尺寸，unit 为 dp(1) 的像素数；
+    phase 为 "pool"（初始蓍草）、"divide"（待分堆）、"piles"（两堆，count为分堆前根数）或 "result"
+    """
+    layout = SceneLayout()
+    center_x = x + width / 2
+    center_y = y + height / 2
+    layout.taiji = (center_x - 30 * unit, y + height - 30 * unit, 60 * unit, 4 * unit)
+    layout.ren = (center_x - 25 * unit, center_y - 2 * unit, 50 * unit, 4 * unit)
+
+    if phase == "pool":
+        straw_height = 50 * unit
+        spacing = 10 * unit
+        layout.row = RowLayout(x + (width - count * spacing) / 2, center_y - straw_height / 2,
+                               spacing, 4 * unit, straw_height, count)
+    elif phase == "divide":
+        straw_height = 45 * unit
+        spacing = 8 * unit
+        layout.row = RowLayout(x + (width - count * spacing) / 2, center_y - straw_height / 2,
+                               spacing, 3 * unit, straw_height, count)
+    elif phase == "piles":
+        straw_height = 40 * unit
+        start_y = center_y - straw_height / 2
+        layout.left_pile = PileLayout(x + 20 * unit, start_y, 6 * unit, 3 * unit, straw_height, 5 * unit, count)
+        layout.right_pile = PileLayout(x + width - 120 * unit, start_y, 6 * unit, 3 * unit, straw_height,
+                                       5 * unit, count)
+    elif phase == "result":
+        yao_height = 12 * unit
+        yao_width = 60 * unit
+        gap = 8 * unit
+        spacing = 22 * unit
+        half_width = (yao_width - gap) / 2
+        y_start = y + height - 100 * unit
+        layout.result_lines = []
+        for line_x in (x + width / 4 - yao_width / 2, x + width * 3 / 4 - yao_width / 2):
+            lines = []
+            for i in range(6):
+                line_y = y_start - i * spacing
+                lines.append((
+                    (line_x, line_y, yao_width, yao_height),
+                    ((line_x, line_y, half_width, yao_height),
+                     (line_x + (yao_width + gap) / 2, line_y, half_width, yao_height)),
+                ))
+            layout.result_lines.append(tuple(lines))
+        layout.result_lines = tuple(layout.result_lines)
+    return layout
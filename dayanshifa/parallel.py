@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+多进程并行批量起卦
+由一个根种子派生各进程互相独立的随机流（SeedSequence.spawn），
+各进程把爻值直接写入共享内存中的对应区段，不经pickle回传；
+同一种子、同一进程数的结果逐位一致
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from dayanshifa.engine import cast_lines
+
+# 各进程内每次生成的卦数，固定以保证结果可复现
+CHUNK_SIZE = 65536
+
+
+def _split(count, workers):
+    """把count个卦尽量均匀地分给各进程，返回 [(起, 止), ...]"""
+    base, extra = divmod(count, workers)
+    bounds = []
+    start = 0
+    for i in range(workers):
+        stop = start + base + (1 if i < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def _fill(out, rng):
+    """用一个随机流逐块填满out（形状 (n, 6)）"""
+    for start in range(0, len(out), CHUNK_SIZE):
+        block = out[start:start + CHUNK_SIZE]
+        block[:] = cast_lines(block.size, rng).reshape(block.shape)
+
+
+def _worker(shm_name, count, start, stop, seed_sequence):
+    """子进程：把 [start, stop) 区段的卦写入共享内存"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        yao_values = np.ndarray((count, 6), dtype=np.int8, buffer=shm.buf)
+        _fill(yao_values[start:stop], np.random.default_rng(seed_sequence))
+        del yao_values
+    finally:
+        shm.close()
+
+
+def parallel_cast_lines(count, seed=None, workers=None):
+    """多进程起卦，返回 (count, 6) 爻值数组
+
+    各进程的随机流由seed派生，结果只取决于seed与workers
+    """
+    workers = workers or os.cpu_count() or 1
+    children = np.random.SeedSequence(seed).spawn(workers)
+
+    if workers == 1:
+        yao_values = np.empty((count, 6), dtype=np.int8)
+        _fill(yao_values, np.random.default_rng(children[0]))
+        return yao_values
+
+    shm = shared_memory.SharedMemory(create=True, size=max(count * 6, 1))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_worker, shm.name, count, start, stop, child)
+                for (start, stop), child in zip(_split(count, workers), children)
+            ]
+            for future in futures:
+                future.result()
+
+        shared = np.ndarray((count, 6), dtype=np.int8, buffer=shm.buf)
+        yao_values = shared.copy()
+        del shared
+        return yao_values
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑的内存历史记录
+每条记录只保存时间戳整数、24位打包爻值（每爻4位，初爻在最低位）和驻留后的求卦事项，
+卦名、卦象、符号均按需由卦表推出；to_dict() 给出与界面保存格式完全一致的字典
+"""
+
+import sys
+from datetime import datetime, timedelta
+
+from dayanshifa.core import DATE_FORMAT, make_record
+
+# 时间戳以不含时区的本地时间计，与日期字符串一一对应
+_EPOCH = datetime(1970, 1, 1)
+
+
+def pack_yao_values(yao_values):
+    """六爻爻值 → 24位整数"""
+    packed = 0
+    for i, v in enumerate(yao_values):
+        packed |= v << (4 * i)
+    return packed
+
+
+def unpack_yao_values(packed):
+    """24位整数 → 六爻爻值"""
+    return [packed >> (4 * i) & 0xF for i in range(6)]
+
+
+def date_to_timestamp(date):
+    """日期字符串 → 时间戳整数"""
+    return int((datetime.strptime(date, DATE_FORMAT) - _EPOCH).total_seconds())
+
+
+def timestamp_to_date(timestamp):
+    """时间戳整数 → 日期字符串"""
+    return (_EPOCH + timedelta(seconds=timestamp)).strftime(DATE_FORMAT)
+
+
+class HistoryRecord:
+    """紧凑历史记录，只读访问方式与记录字典相同（get / []）"""
+
+    __slots__ = ("timestamp", "packed", "question")
+
+    def __init__(self, question, timestamp, packed):
+        self.question = sys.intern(question)
+        self.timestamp = timestamp
+        self.packed = packed
+
+    @classmethod
+    def from_dict(cls, record):
+        """由记录字典构造；无法无损压缩的记录原样返回字典"""
+        try:
+            yao_values = record["yao_values"]
+            if len(yao_values) != 6 or not all(6 <= v <= 9 for v in yao_values):
+                return record
+            compact = cls(record["question"], date_to_timestamp(record["date"]),
+                          pack_yao_values(yao_values))
+        except (KeyError, TypeError, ValueError):
+            return record
+
+        # 派生字段与卦表不一致（如旧版数据）时保留原字典
+        if compact.to_dict() != record:
+            return record
+        return compact
+
+    @property
+    def date(self):
+        """日期字符串"""
+        return timestamp_to_date(self.timestamp)
+
+    @property
+    def yao_values(self):
+        """六爻爻值"""
+        return unpack_yao_values(self.packed)
+
+    def to_dict(self):
+        """转换为记录字典（与界面保存格式一致）"""
+        return make_record(self.question, self.date, self.yao_values)
+
+    def get(self, key, default=None):
+        """按字段名取值"""
+        if key == "question":
+            return self.question
+        if key == "date":
+            return self.date
+        if key == "yao_values":
+            return self.yao_values
+        return self.to_dict().get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __eq__(self, other):
+        if isinstance(other, HistoryRecord):
+            return (self.timestamp, self.packed, self.question) == (other.timestamp, other.packed, other.question)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.timestamp, self.packed, self.question))
+
+
+def compact_records(records):
+    """批量压缩记录字典"""
+    return [HistoryRecord.from_dict(r) for r in records]
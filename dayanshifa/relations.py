@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+卦与卦的关系索引 - 导入时一次建好，查询均为常数时间的查表
+卦码为6位整数，初爻为最低位
+"""
+
+
+def _nuclear(code):
+    """互卦：二三四爻为下卦，三四五爻为上卦"""
+    return (code >> 1 & 0b111) | (code >> 2 & 0b111) << 3
+
+
+def _reversed(code):
+    """综卦：六爻上下颠倒"""
+    return int(format(code, "06b")[::-1], 2)
+
+
+# 卦码 → 互卦码
+NUCLEAR = tuple(_nuclear(code) for code in range(64))
+
+# 卦码 → 错卦码（六爻阴阳全变）
+COMPLEMENT = tuple(code ^ 0b111111 for code in range(64))
+
+# 卦码 → 综卦码
+REVERSED = tuple(_reversed(code) for code in range(64))
+
+# 本卦码×64+变爻掩码 → 之卦码
+TRANSITIONS = bytes(code ^ mask for code in range(64) for mask in range(64))
+
+
+def transition(code, moving_mask):
+    """按变爻掩码求之卦码"""
+    return TRANSITIONS[code << 6 | moving_mask]
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+快速起卦 - 基于精确余数分布的别名表采样
+每种可达蓍草数的一变分布、以及三变合成的爻值分布均以有理数精确计算，
+再构造Walker别名表，一次O(1)抽样即得一爻
+"""
+
+import random
+from fractions import Fraction
+from math import lcm
+
+from dayanshifa.core import DaYanShiFa
+
+
+def change_distribution(straw_count):
+    """一变的精确分布：{变后蓍草数: 概率}，分两仪时左堆1..n-1等可能"""
+    distribution = {}
+    weight = Fraction(1, straw_count - 1)
+    for left in range(1, straw_count):
+        right = straw_count - left - 1
+        removed = DaYanShiFa.get_remainder(left) + DaYanShiFa.get_remainder(right) + 1
+        remaining = straw_count - removed
+        distribution[remaining] = distribution.get(remaining, 0) + weight
+    return distribution
+
+
+def _build_change_distributions(working_straws=49, changes=3):
+    """计算每一变所有可达蓍草数的一变分布"""
+    distributions = {}
+    counts = {working_straws}
+    for _ in range(changes):
+        next_counts = set()
+        for count in counts:
+            if count not in distributions:
+                distributions[count] = change_distribution(count)
+            next_counts.update(distributions[count])
+        counts = next_counts
+    return distributions
+
+
+def _build_line_distribution(distributions, working_straws=49, changes=3):
+    """三变合成一爻的精确分布：{爻值: 概率}"""
+    current = {working_straws: Fraction(1)}
+    for _ in range(changes):
+        following = {}
+        for count, probability in current.items():
+            for remaining, p in distributions[count].items():
+                following[remaining] = following.get(remaining, 0) + probability * p
+        current = following
+
+    line = {}
+    for count, probability in current.items():
+        line[count // 4] = line.get(count // 4, 0) + probability
+    return dict(sorted(line.items()))
+
+
+class AliasTable:
+    """Walker别名表 - 以整数阈值存储，抽样精确且为O(1)"""
+
+    def __init__(self, distribution):
+        self.values = list(distribution)
+        self.size = len(self.values)
+        self.denominator = lcm(*(Fraction(p).denominator for p in distribution.values()))
+
+        # 放大为整数：每列容量为denominator，总量为size * denominator
+        scaled = [int(Fraction(p) * self.size * self.denominator) for p in distribution.values()]
+        self.threshold = [self.denominator] * self.size
+        self.alias = list(range(self.size))
+
+        small = [i for i, w in enumerate(scaled) if w < self.denominator]
+        large = [i for i, w in enumerate(scaled) if w >= self.denominator]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.threshold[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= self.denominator - scaled[s]
+            if scaled[l] < self.denominator:
+                small.append(l)
+            else:
+                large.append(l)
+
+    def draw(self, rng=None):
+        """抽取一个取值"""
+        rng = rng or random
+        column, u = divmod(rng.randrange(self.size * self.denominator), self.denominator)
+        if u < self.threshold[column]:
+            return self.values[column]
+        return self.values[self.alias[column]]
+
+
+# 各蓍草数（49 → 44/40 → …）的一变分布
+CHANGE_DISTRIBUTIONS = _build_change_distributions()
+
+# 一爻（6/7/8/9）的精确分布
+LINE_DISTRIBUTION = _build_line_distribution(CHANGE_DISTRIBUTIONS)
+
+CHANGE_TABLES = {count: AliasTable(d) for count, d in CHANGE_DISTRIBUTIONS.items()}
+LINE_TABLE = AliasTable(LINE_DISTRIBUTION)
+
+
+def draw_change(straw_count, rng=None):
+    """抽取一变后剩余的蓍草数"""
+    return CHANGE_TABLES[straw_count].draw(rng)
+
+
+def draw_line(rng=None):
+    """抽取一爻的爻值"""
+    return LINE_TABLE.draw(rng)
+
+
+def fast_cast(rng=None):
+    """快速起卦，返回六爻爻值（初爻在前）"""
+    return [LINE_TABLE.draw(rng) for _ in range(6)]
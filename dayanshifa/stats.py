@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+历史统计 - 增量维护的汇总数据
+每保存一条记录只更新几个计数：各卦（本卦、之卦）出现次数、各爻位动爻次数、每日起卦数；
+统计数据单独存为小文件，查看统计时直接读取，无需扫描全部历史
+"""
+
+import json
+import os
+
+from dayanshifa.core import HEXAGRAM_TABLE, encode_yao_values
+from dayanshifa.history import write_atomic
+
+STATS_VERSION = 1
+
+
+class HistoryStats:
+    """历史统计"""
+
+    def __init__(self):
+        self.total = 0
+        self.original_counts = {}
+        self.changed_counts = {}
+        self.moving_counts = [0] * 6
+        self.daily_counts = {}
+
+    def add(self, record):
+        """计入一条记录（字典或紧凑记录）"""
+        self.total += 1
+        day = record.get("date", "")[:10]
+        self.daily_counts[day] = self.daily_counts.get(day, 0) + 1
+
+        codes = encode_yao_values(record.get("yao_values", []))
+        if not codes:
+            return
+        original, changed, mask = codes
+        name = HEXAGRAM_TABLE[original][0]
+        self.original_counts[name] = self.original_counts.get(name, 0) + 1
+        if mask:
+            name = HEXAGRAM_TABLE[changed][0]
+            self.changed_counts[name] = self.changed_counts.get(name, 0) + 1
+        for i in range(6):
+            if mask >> i & 1:
+                self.moving_counts[i] += 1
+
+    @classmethod
+    def rebuild(cls, records):
+        """由全部记录重新统计"""
+        stats = cls()
+        for record in records:
+            stats.add(record)
+        return stats
+
+    def top_hexagrams(self, n=5, changed=False):
+        """出现次数最多的n个卦，[(卦名, 次数), ...]"""
+        counts = self.changed_counts if changed else self.original_counts
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典"""
+        return {
+            "version": STATS_VERSION,
+            "total": self.total,
+            "original_counts": self.original_counts,
+            "changed_counts": self.changed_counts,
+            "moving_counts": self.moving_counts,
+            "daily_counts": self.daily_counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """由字典构造"""
+        stats = cls()
+        stats.total = data["total"]
+        stats.original_counts = dict(data["original_counts"])
+        stats.changed_counts = dict(data["changed_counts"])
+        stats.moving_counts = list(data["moving_counts"])
+        stats.daily_counts = dict(data["daily_counts"])
+        return stats
+
+    def save(self, path):
+        """保存到文件（原子替换）"""
+        write_atomic(path, [json.dumps(self.to_dict(), ensure_ascii=False)])
+
+    @classmethod
+    def load(cls, path):
+        """从文件读取，文件不存在或损坏时返回None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != STATS_VERSION:
+                return None
+            return cls.from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
@@ -4,29 +4,41 @@
 使用蓍草模拟周易大衍筮法起卦
 """
 
-import json
 import os
 import random
-from datetime import datetime
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from functools import partial
 
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.floatlayout import FloatLayout
-from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.popup import Popup
 from kivy.uix.widget import Widget
-from kivy.graphics import Rectangle, Color, Line
+from kivy.graphics import Rectangle, Color, Line, InstructionGroup, Mesh
 from kivy.core.window import Window
 from kivy.core.clipboard import Clipboard
 from kivy.core.text import LabelBase
 from kivy.clock import Clock
 from kivy.metrics import dp, sp
+from kivy.properties import ObjectProperty
+from kivy.logger import Logger
 from kivy.utils import platform
 
+from dayanshifa.core import DATE_FORMAT, DaYanShiFa, make_record
+from dayanshifa.history import HistoryWriter, JsonlHistoryStore
+from dayanshifa.history_segments import SegmentedHistoryStore
+from dayanshifa.layout import scene_layout
+from dayanshifa.records import HistoryRecord, compact_records
+from dayanshifa.stats import HistoryStats
+
 # 设置窗口背景色为淡蓝色
 Window.clearcolor = (0.878, 0.925, 0.961, 1)  # 淡蓝色 #E0ECF5
 
@@ -39,339 +51,236 @@ if os.path.exists(FONT_PATH):
 else:
     DEFAULT_FONT = None
 
-# 六十四卦数据
-HEXAGRAMS = {
-    "111111": ("乾", "天"), "000000": ("坤", "地"), "100010": ("屯", "水雷"),
-    "010001": ("蒙", "山水"), "111010": ("需", "水天"), "010111": ("讼", "天水"),
-    "010000": ("师", "地水"), "000010": ("比", "水地"), "111011": ("小畜", "风天"),
-    "110111": ("履", "天泽"), "111000": ("泰", "地天"), "000111": ("否", "天地"),
-    "101111": ("同人", "天火"), "111101": ("大有", "火天"), "001000": ("谦", "地山"),
-    "000100": ("豫", "雷地"), "100110": ("随", "泽雷"), "011001": ("蛊", "山风"),
-    "110000": ("临", "地泽"), "000011": ("观", "风地"), "100101": ("噬嗑", "火雷"),
-    "101001": ("贲", "山火"), "000001": ("剥", "山地"), "100000": ("复", "地雷"),
-    "100111": ("无妄", "天雷"), "111001": ("大畜", "山天"), "100001": ("颐", "山雷"),
-    "011110": ("大过", "泽风"), "010010": ("坎", "水"), "101101": ("离", "火"),
-    "001110": ("咸", "泽山"), "011100": ("恒", "雷风"), "001111": ("遁", "天山"),
-    "111100": ("大壮", "雷天"), "000101": ("晋", "火地"), "101000": ("明夷", "地火"),
-    "101011": ("家人", "风火"), "110101": ("睽", "火泽"), "001010": ("蹇", "水山"),
-    "010100": ("解", "雷水"), "110001": ("损", "山泽"), "100011": ("益", "风雷"),
-    "111110": ("夬", "泽天"), "011111": ("姤", "天风"), "000110": ("萃", "泽地"),
-    "011000": ("升", "地风"), "010110": ("困", "泽水"), "011010": ("井", "水风"),
-    "101110": ("革", "泽火"), "011101": ("鼎", "火风"), "100100": ("震", "雷"),
-    "001001": ("艮", "山"), "001011": ("渐", "风山"), "110100": ("归妹", "雷泽"),
-    "101100": ("丰", "雷火"), "001101": ("旅", "火山"), "011011": ("巽", "风"),
-    "110110": ("兑", "泽"), "010011": ("涣", "风水"), "110010": ("节", "水泽"),
-    "001100": ("中孚", "风泽"), "110011": ("小过", "雷山"), "010101": ("既济", "水火"),
-    "101010": ("未济", "火水"),
-}
+# 历史列表每页加载的条数
+HISTORY_PAGE_SIZE = 50
+
+# 文字纹理缓存的总像素数上限（RGBA纹理约4字节/像素，即约8MB显存）
+TEXT_TEXTURE_CACHE_PIXELS = 2 * 1024 * 1024
+
 
+# 画布配色
+BACKGROUND_COLOR = (0.878, 0.925, 0.961, 1)  # 淡蓝色
+STRAW_COLOR = (0.545, 0.271, 0.075, 1)  # 棕色
+GOLD_COLOR = (0.855, 0.647, 0.125, 1)  # 金色
+REN_COLOR = (0.804, 0.522, 0.247, 1)
+YANG_COLOR = (0.769, 0.118, 0.227, 1)
+YIN_COLOR = (0.118, 0.565, 1, 1)
 
-class DaYanShiFa:
-    """大衍筮法核心逻辑类"""
-    
-    def __init__(self):
-        self.reset()
-    
-    def reset(self):
-        """重置状态"""
-        self.total_straws = 50
-        self.working_straws = 49
-        self.current_yao = 0
-        self.current_bian = 0
-        self.yao_values = []
-        self.bian_remainders = []
-        self.step = "init"
-        self.left_pile = 0
-        self.right_pile = 0
-        self.ren_straw = 0
-        self.left_remainder = 0
-        self.right_remainder = 0
-        self.current_straw_count = 49
-    
-    def get_yao_symbol(self, value, for_original=True):
-        """获取爻的符号"""
-        if value == 6:
-            return "⚋" if for_original else "⚊"
-        elif value == 7:
-            return "⚊"
-        elif value == 8:
-            return "⚋"
-        elif value == 9:
-            return "⚊" if for_original else "⚋"
-        return ""
-    
-    def get_binary(self, value, for_original=True):
-        """获取爻的二进制值"""
-        if value == 6:
-            return "0" if for_original else "1"
-        elif value == 7:
-            return "1"
-        elif value == 8:
-            return "0"
-        elif value == 9:
-            return "1" if for_original else "0"
-        return ""
-    
-    def get_hexagram_info(self, yao_values, for_original=True):
-        """根据爻值获取卦象信息"""
-        binary = ""
-        symbols = []
-        for v in yao_values:
-            binary += self.get_binary(v, for_original)
-            symbols.append(self.get_yao_symbol(v, for_original))
-        
-        if binary in HEXAGRAMS:
-            name, xiang = HEXAGRAMS[binary]
-            return {
-                "name": name,
-                "xiang": xiang,
-                "symbols": symbols,
-                "binary": binary
-            }
-        return None
-    
-    def has_bian_yao(self, yao_values):
-        """检查是否有变爻"""
-        return any(v in [6, 9] for v in yao_values)
+
+class MeshLayer:
+    """同色矩形图层 - 全部矩形合并为一个Mesh，每层只有一次绘制调用
+    
+    每步只重写顶点与索引，不创建新指令；Kivy默认着色器没有逐顶点颜色，
+    不同颜色（如余数高亮）各占一层叠加绘制
+    """
+    
+    def __init__(self, color):
+        self.group = InstructionGroup()
+        self.color = Color(*color)
+        self.mesh = Mesh(mode='triangles')
+        self.group.add(self.color)
+        self.group.add(self.mesh)
+        self.indices = []
+        self.visible = 0
+    
+    def update(self, rects):
+        """显示给定的矩形[(x, y, 宽, 高), ...]，其余隐藏"""
+        vertices = []
+        for x, y, width, height in rects:
+            right = x + width
+            top = y + height
+            vertices.extend((x, y, 0, 0, right, y, 1, 0, right, top, 1, 1, x, top, 0, 1))
+        self.mesh.vertices = vertices
+        self.show(len(vertices) // 16)
+    
+    def show(self, count):
+        """只绘制前count个矩形"""
+        while len(self.indices) < count * 6:
+            i = len(self.indices) // 6 * 4
+            self.indices.extend((i, i + 1, i + 2, i + 2, i + 3, i))
+        self.mesh.indices = self.indices[:count * 6]
+        self.visible = count
+    
+    def truncate(self, count):
+        """只保留前count个矩形"""
+        self.show(min(self.visible, count))
+    
+    def clear(self):
+        """隐藏全部矩形"""
+        self.show(0)
 
 
 class StrawCanvas(Widget):
-    """蓍草画布类 - Kivy版"""
+    """蓍草画布类 - Kivy版
+    
+    背景、太极、蓍草、左右两堆、高亮、挂一、卦象各占一个常驻图层，
+    每步只更新已有指令，不清空画布；每帧绘制调用数与蓍草根数无关
+    """
     
     def __init__(self, app, **kwargs):
         super().__init__(**kwargs)
         self.app = app
-        self.straw_positions = []
-        self.divide_straw_positions = []
-        self.left_pile_areas = []
-        self.right_pile_areas = []
-        self.bind(size=self.on_size_change)
+        # 当前画面的布局，及各部分的布局（点击检测用），未显示时为None
+        self.layout = None
+        self.pool_layout = None
+        self.divide_layout = None
+        self.left_pile_layout = None
+        self.right_pile_layout = None
+        self.left_count = 0
+        self.right_count = 0
+        
+        with self.canvas:
+            Color(*BACKGROUND_COLOR)
+            self.background = Rectangle(pos=self.pos, size=self.size)
+        self.taiji_layer = MeshLayer(GOLD_COLOR)
+        self.straw_layer = MeshLayer(STRAW_COLOR)
+        self.left_layer = MeshLayer(STRAW_COLOR)
+        self.right_layer = MeshLayer(STRAW_COLOR)
+        self.left_highlight_layer = MeshLayer(GOLD_COLOR)
+        self.right_highlight_layer = MeshLayer(GOLD_COLOR)
+        self.ren_layer = MeshLayer(REN_COLOR)
+        self.yang_layer = MeshLayer(YANG_COLOR)
+        self.yin_layer = MeshLayer(YIN_COLOR)
+        self.layers = [
+            self.taiji_layer, self.straw_layer, self.left_layer, self.right_layer,
+            self.left_highlight_layer, self.right_highlight_layer, self.ren_layer, self.yang_layer, self.yin_layer,
+        ]
+        for layer in self.layers:
+            self.canvas.add(layer.group)
+        
+        # 尺寸连续变化（如旋转屏幕）时每帧只重绘一次
+        self._redraw_trigger = Clock.create_trigger(self.redraw_current_state)
+        self.bind(pos=self._update_background, size=self._update_background)
+        self.bind(pos=self.on_size_change, size=self.on_size_change)
+    
+    def _update_background(self, *args):
+        """背景跟随控件位置与大小"""
+        self.background.pos = self.pos
+        self.background.size = self.size
     
     def on_size_change(self, *args):
-        """尺寸变化时重绘"""
+        """尺寸或位置变化时，在下一帧重绘"""
         if self.app.dayan.step != "init":
-            self.redraw_current_state()
+            self._redraw_trigger()
     
-    def redraw_current_state(self):
-        """重绘当前状态"""
-        pass
+    def redraw_current_state(self, *args):
+        """按演算状态重绘当前画面"""
+        self.render(self.app.dayan.scene_state())
+    
+    def render(self, state):
+        """由画面状态（DaYanShiFa.scene_state()）绘制整幅画面"""
+        step = state["step"]
+        if step == "init":
+            self.clear_canvas()
+        elif step == "select_taiji":
+            self.draw_initial_straws()
+        elif step == "divide_piles":
+            self.draw_straws_for_divide(state["straw_count"])
+        elif step == "done":
+            original_info, changed_info = self.app.dayan.get_result(state["yao_values"])
+            self.draw_result(original_info, changed_info, state["yao_values"])
+        else:
+            left_count = state["left_pile"]
+            right_count = state["right_pile"]
+            self.draw_two_piles(left_count, right_count)
+            if state["ren_straw"]:
+                self.draw_ren_straw()
+            if state["left_highlight"]:
+                self.highlight_remainder(True, state["left_highlight"], left_count)
+            if state["right_highlight"]:
+                self.highlight_remainder(False, state["right_highlight"], right_count)
+    
+    def show_layers(self, *layers):
+        """隐藏不在layers中的图层"""
+        for layer in self.layers:
+            if layer not in layers:
+                layer.clear()
     
     def clear_canvas(self):
         """清空画布"""
-        self.canvas.clear()
-        with self.canvas:
-            Color(0.878, 0.925, 0.961, 1)  # 淡蓝色背景
-            Rectangle(pos=self.pos, size=self.size)
+        self.show_layers()
+    
+    def get_layout(self, phase, count=0):
+        """当前画布尺寸下某一阶段的布局（缓存），并设为当前画面布局"""
+        self.layout = scene_layout(self.x, self.y, self.width, self.height, count, phase, dp(1))
+        return self.layout
     
     def draw_initial_straws(self):
         """绘制初始50根蓍草"""
-        self.canvas.clear()
-        self.straw_positions = []
+        self.show_layers(self.straw_layer)
+        self.divide_layout = self.left_pile_layout = self.right_pile_layout = None
         
-        with self.canvas:
-            Color(0.878, 0.925, 0.961, 1)  # 淡蓝色背景
-            Rectangle(pos=self.pos, size=self.size)
-            
-            straw_height = dp(50)
-            straw_width = dp(4)
-            spacing = dp(10)
-            total_width = 50 * spacing
-            start_x = (self.width - total_width) / 2
-            start_y = self.height / 2 - straw_height / 2
-            
-            Color(0.545, 0.271, 0.075, 1)  # 棕色
-            for i in range(50):
-                x = start_x + i * spacing
-                Rectangle(pos=(x, start_y), size=(straw_width, straw_height))
-                self.straw_positions.append({
-                    'x': x,
-                    'y': start_y,
-                    'width': straw_width,
-                    'height': straw_height,
-                    'index': i
-                })
+        self.pool_layout = self.get_layout("pool", 50).row
+        self.straw_layer.update(self.pool_layout.rects())
     
     def draw_taiji_straw(self):
         """绘制太极蓍草"""
-        with self.canvas:
-            Color(0.855, 0.647, 0.125, 1)  # 金色
-            x = self.width / 2 - dp(30)
-            y = self.height - dp(30)
-            Rectangle(pos=(x, y), size=(dp(60), dp(4)))
-            
-            Color(0.4, 0.4, 0.4, 1)
+        self.taiji_layer.update([(self.layout or self.get_layout("result")).taiji])
     
     def draw_straws_for_divide(self, count):
         """绘制待分堆的蓍草"""
-        self.canvas.clear()
-        self.divide_straw_positions = []
+        self.show_layers(self.taiji_layer, self.straw_layer)
+        self.pool_layout = self.left_pile_layout = self.right_pile_layout = None
         
-        with self.canvas:
-            Color(0.878, 0.925, 0.961, 1)  # 淡蓝色背景
-            Rectangle(pos=self.pos, size=self.size)
-            
-            # 太极
-            Color(0.855, 0.647, 0.125, 1)
-            x = self.width / 2 - dp(30)
-            y = self.height - dp(30)
-            Rectangle(pos=(x, y), size=(dp(60), dp(4)))
-            
-            # 蓍草
-            straw_height = dp(45)
-            straw_width = dp(3)
-            spacing = dp(8)
-            total_width = count * spacing
-            start_x = (self.width - total_width) / 2
-            start_y = self.height / 2 - straw_height / 2
-            
-            Color(0.545, 0.271, 0.075, 1)
-            for i in range(count):
-                x = start_x + i * spacing
-                Rectangle(pos=(x, start_y), size=(straw_width, straw_height))
-                self.divide_straw_positions.append(x + straw_width / 2)
-            
-            self.divide_start_x = start_x
-            self.divide_end_x = start_x + total_width
-            self.divide_count = count
+        layout = self.get_layout("divide", count)
+        self.taiji_layer.update([layout.taiji])
+        self.divide_layout = layout.row
+        self.straw_layer.update(self.divide_layout.rects())
     
     def draw_two_piles(self, left_count, right_count):
         """绘制分成两堆的蓍草"""
-        self.canvas.clear()
-        self.left_pile_areas = []
-        self.right_pile_areas = []
-        
-        with self.canvas:
-            Color(0.878, 0.925, 0.961, 1)  # 淡蓝色背景
-            Rectangle(pos=self.pos, size=self.size)
-            
-            # 太极
-            Color(0.855, 0.647, 0.125, 1)
-            x = self.width / 2 - dp(30)
-            y = self.height - dp(30)
-            Rectangle(pos=(x, y), size=(dp(60), dp(4)))
-            
-            straw_height = dp(40)
-            straw_width = dp(3)
-            spacing = dp(6)
-            
-            # 左堆
-            Color(0.545, 0.271, 0.075, 1)
-            left_start_x = dp(20)
-            left_start_y = self.height / 2 - straw_height / 2
-            for i in range(left_count):
-                row = i // 15
-                col = i % 15
-                x = left_start_x + col * spacing
-                y_pos = left_start_y - row * (straw_height + dp(5))
-                Rectangle(pos=(x, y_pos), size=(straw_width, straw_height))
-                self.left_pile_areas.append({
-                    'x': x, 'y': y_pos, 
-                    'width': straw_width, 'height': straw_height
-                })
-            
-            # 右堆
-            right_start_x = self.width - dp(120)
-            for i in range(right_count):
-                row = i // 15
-                col = i % 15
-                x = right_start_x + col * spacing
-                y_pos = left_start_y - row * (straw_height + dp(5))
-                Rectangle(pos=(x, y_pos), size=(straw_width, straw_height))
-                self.right_pile_areas.append({
-                    'x': x, 'y': y_pos,
-                    'width': straw_width, 'height': straw_height
-                })
-            
-            # 标签
-            Color(0.2, 0.2, 0.2, 1)
+        self.show_layers(self.taiji_layer, self.left_layer, self.right_layer)
+        self.pool_layout = self.divide_layout = None
+        
+        layout = self.get_layout("piles", left_count + right_count)
+        self.taiji_layer.update([layout.taiji])
+        self.left_pile_layout = layout.left_pile
+        self.right_pile_layout = layout.right_pile
+        self.left_count = left_count
+        self.right_count = right_count
+        self.left_layer.update(self.left_pile_layout.rects(0, left_count))
+        self.right_layer.update(self.right_pile_layout.rects(0, right_count))
         
         # 更新标签
         self.app.update_pile_labels(left_count, right_count)
     
+    def take_ren_straw(self, left_count, right_count):
+        """挂一：右堆去掉最后一根，显示人蓍草"""
+        self.right_layer.truncate(right_count)
+        self.right_count = right_count
+        self.draw_ren_straw()
+        self.app.update_pile_labels(left_count, right_count)
+    
     def draw_ren_straw(self):
         """绘制人蓍草"""
-        with self.canvas:
-            Color(0.804, 0.522, 0.247, 1)
-            x = self.width / 2 - dp(25)
-            y = self.height / 2 - dp(2)
-            Rectangle(pos=(x, y), size=(dp(50), dp(4)))
+        self.ren_layer.update([(self.layout or self.get_layout("result")).ren])
     
     def highlight_remainder(self, is_left, count, pile_count):
         """高亮余数蓍草"""
-        straw_height = dp(40)
-        straw_width = dp(3)
-        spacing = dp(6)
-        
-        with self.canvas:
-            Color(0.855, 0.647, 0.125, 1)
-            
-            if is_left:
-                left_start_x = dp(20)
-                left_start_y = self.height / 2 - straw_height / 2
-                start_idx = pile_count - count
-                for i in range(start_idx, pile_count):
-                    row = i // 15
-                    col = i % 15
-                    x = left_start_x + col * spacing
-                    y_pos = left_start_y - row * (straw_height + dp(5))
-                    Rectangle(pos=(x, y_pos), size=(straw_width, straw_height))
-            else:
-                right_start_x = self.width - dp(120)
-                left_start_y = self.height / 2 - straw_height / 2
-                start_idx = pile_count - count
-                for i in range(start_idx, pile_count):
-                    row = i // 15
-                    col = i % 15
-                    x = right_start_x + col * spacing
-                    y_pos = left_start_y - row * (straw_height + dp(5))
-                    Rectangle(pos=(x, y_pos), size=(straw_width, straw_height))
+        if is_left:
+            self.left_highlight_layer.update(self.left_pile_layout.rects(pile_count - count, pile_count))
+        else:
+            self.right_highlight_layer.update(self.right_pile_layout.rects(pile_count - count, pile_count))
     
     def draw_result(self, original_info, changed_info, yao_values):
         """绘制起卦结果"""
-        self.canvas.clear()
+        self.show_layers(self.yang_layer, self.yin_layer)
+        self.pool_layout = self.divide_layout = self.left_pile_layout = self.right_pile_layout = None
         
-        with self.canvas:
-            Color(0.878, 0.925, 0.961, 1)  # 淡蓝色背景
-            Rectangle(pos=self.pos, size=self.size)
-            
-            yao_height = dp(12)
-            yao_width = dp(60)
-            gap = dp(8)
-            spacing = dp(22)
-            
-            # 本卦位置
-            x1 = self.width / 4 - yao_width / 2
-            y_start = self.height - dp(100)
-            
-            for i, symbol in enumerate(reversed(original_info["symbols"])):
-                y = y_start - i * spacing
-                yao_idx = 5 - i
-                is_bian = yao_values[yao_idx] in [6, 9]
-                
+        result_lines = self.get_layout("result").result_lines
+        yang_rects = []
+        yin_rects = []
+        hexagrams = [original_info, changed_info] if changed_info else [original_info]
+        
+        for lines, info in zip(result_lines, hexagrams):
+            for (yang_rect, yin_rects_pair), symbol in zip(lines, reversed(info["symbols"])):
                 if symbol == "⚊":
-                    Color(0.769, 0.118, 0.227, 1)
-                    Rectangle(pos=(x1, y), size=(yao_width, yao_height))
+                    yang_rects.append(yang_rect)
                 else:
-                    Color(0.118, 0.565, 1, 1)
-                    Rectangle(pos=(x1, y), size=((yao_width - gap) / 2, yao_height))
-                    Rectangle(pos=(x1 + (yao_width + gap) / 2, y), 
-                            size=((yao_width - gap) / 2, yao_height))
-            
-            # 之卦位置
-            if changed_info:
-                x2 = self.width * 3 / 4 - yao_width / 2
-                
-                for i, symbol in enumerate(reversed(changed_info["symbols"])):
-                    y = y_start - i * spacing
-                    
-                    if symbol == "⚊":
-                        Color(0.769, 0.118, 0.227, 1)
-                        Rectangle(pos=(x2, y), size=(yao_width, yao_height))
-                    else:
-                        Color(0.118, 0.565, 1, 1)
-                        Rectangle(pos=(x2, y), size=((yao_width - gap) / 2, yao_height))
-                        Rectangle(pos=(x2 + (yao_width + gap) / 2, y),
-                                size=((yao_width - gap) / 2, yao_height))
+                    yin_rects.extend(yin_rects_pair)
+        
+        self.yang_layer.update(yang_rects)
+        self.yin_layer.update(yin_rects)
     
     def on_touch_down(self, touch):
         """触摸事件处理"""
@@ -380,21 +289,99 @@ class StrawCanvas(Widget):
             return True
         return super().on_touch_down(touch)
     
+    def hit_pool_straw(self, x, y):
+        """检查是否点中了初始蓍草"""
+        return self.pool_layout is not None and self.pool_layout.index_at(x, y, dp(5)) >= 0
+    
+    def split_count(self, x):
+        """在横坐标x处分两仪时左堆的根数，未显示待分蓍草时返回None"""
+        if self.divide_layout is None:
+            return None
+        return self.divide_layout.split_count(x)
+    
     def is_in_left_pile(self, x, y):
         """检查是否点击了左堆"""
-        for area in self.left_pile_areas:
-            if (area['x'] <= x <= area['x'] + area['width'] + dp(10) and
-                area['y'] <= y <= area['y'] + area['height']):
-                return True
-        return x < self.width / 2 and len(self.left_pile_areas) > 0
+        if self.left_pile_layout is None or not self.left_count:
+            return False
+        if self.left_pile_layout.index_at(x, y, self.left_count, dp(10)) >= 0:
+            return True
+        return x < self.center_x
     
     def is_in_right_pile(self, x, y):
         """检查是否点击了右堆"""
-        for area in self.right_pile_areas:
-            if (area['x'] <= x <= area['x'] + area['width'] + dp(10) and
-                area['y'] <= y <= area['y'] + area['height']):
-                return True
-        return x > self.width / 2 and len(self.right_pile_areas) > 0
+        if self.right_pile_layout is None or not self.right_count:
+            return False
+        if self.right_pile_layout.index_at(x, y, self.right_count, dp(10)) >= 0:
+            return True
+        return x > self.center_x
+
+
+class CachedLabel(Label):
+    """带文字纹理缓存的标签 - 文字与样式相同时直接复用已渲染的纹理，不再重新栅格化"""
+    
+    # 所有实例共用，按最近使用顺序淘汰，总像素数不超过TEXT_TEXTURE_CACHE_PIXELS
+    _texture_cache = OrderedDict()
+    _cache_pixels = 0
+    
+    @classmethod
+    def clear_cache(cls):
+        """清空纹理缓存（如GL上下文重建后）"""
+        cls._texture_cache.clear()
+        CachedLabel._cache_pixels = 0
+    
+    def _texture_key(self):
+        """缓存键：文字、文本框大小与全部样式选项"""
+        options = tuple(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in sorted(self._label.options.items())
+        )
+        usersize = self._label.usersize
+        return (self._label.text, tuple(usersize) if usersize else None, options)
+    
+    def texture_update(self, *largs):
+        """更新纹理，命中缓存时跳过渲染"""
+        if not self._label.text or self.markup:
+            super().texture_update(*largs)
+            return
+        
+        key = self._texture_key()
+        cached = self._texture_cache.get(key)
+        if cached is not None:
+            self._texture_cache.move_to_end(key)
+            texture, self.is_shortened, _ = cached
+            self.texture = texture
+            self.texture_size = list(texture.size)
+            return
+        
+        # 核心标签在尺寸不变时会复用原纹理重绘，先断开以免改写缓存中的纹理
+        self._label.texture = None
+        super().texture_update(*largs)
+        if self.texture is None:
+            return
+        pixels = self.texture.width * self.texture.height
+        if pixels > TEXT_TEXTURE_CACHE_PIXELS:
+            return
+        self._texture_cache[key] = (self.texture, self.is_shortened, pixels)
+        CachedLabel._cache_pixels += pixels
+        while CachedLabel._cache_pixels > TEXT_TEXTURE_CACHE_PIXELS:
+            _, (_, _, evicted) = self._texture_cache.popitem(last=False)
+            CachedLabel._cache_pixels -= evicted
+
+
+class HistoryRow(Button):
+    """历史记录列表行 - 由RecycleView复用"""
+    
+    record = ObjectProperty(None, allownone=True)
+    
+    def __init__(self, **kwargs):
+        kwargs.setdefault('font_size', sp(14))
+        if DEFAULT_FONT:
+            kwargs.setdefault('font_name', DEFAULT_FONT)
+        super().__init__(**kwargs)
+    
+    def on_press(self):
+        """查看该条记录详情"""
+        App.get_running_app().show_history_detail(self)
 
 
 class DaYanApp(App):
@@ -404,18 +391,36 @@ class DaYanApp(App):
         super().__init__(**kwargs)
         self.dayan = DaYanShiFa()
         self.is_started = False
+        # 历史按月分段存放在目录中，旧版单文件历史首次启动时自动迁移
         self.history_file = self.get_history_path()
-        self.history_data = self.load_history()
+        self.history_store = SegmentedHistoryStore(self.history_file, JsonlHistoryStore(
+            self.get_history_path('dayan_history.jsonl'), self.get_history_path('dayan_history.json')))
+        self.prepare_history()
+        # 历史在首帧之后于后台加载，加载期间已可起卦与查看已加载部分
+        # history_data 只在末尾追加，加载期间新保存的记录先放在 history_pending，加载完成后接在末尾
+        self.history_data = []
+        self.history_pending = []
+        self.history_state = "unloaded"
+        # 本次启动的时间，加载完成时只在此后的记录中查找已被加载的新记录
+        self.history_session_start = datetime.now().strftime(DATE_FORMAT)
+        self.history_popup = None
+        self.history_writer = HistoryWriter(self.history_store, on_error=self._on_history_error)
+        # 统计增量维护，与历史条数不符（如上次异常退出）时在历史加载完成后重建
+        self.stats_file = self.get_history_path('dayan_stats.json')
+        self.stats = HistoryStats.load(self.stats_file) or HistoryStats()
         self.current_question = ""
+        # 同一事件中对标签的多次修改合并到下一帧一次写入
+        self._pending_labels = {}
+        self._label_trigger = Clock.create_trigger(self._flush_labels)
         self.result_original = None
         self.result_changed = None
     
-    def get_history_path(self):
+    def get_history_path(self, filename='dayan_history'):
         """获取历史文件路径"""
         if platform == 'android':
             from android.storage import app_storage_path
-            return os.path.join(app_storage_path(), 'dayan_history.json')
-        return 'dayan_history.json'
+            return os.path.join(app_storage_path(), filename)
+        return filename
     
     def build(self):
         """构建UI"""
@@ -460,7 +465,7 @@ class DaYanApp(App):
         main_layout.add_widget(top_layout)
         
         # 进度显示
-        self.progress_label = Label(
+        self.progress_label = CachedLabel(
             text='',
             font_size=sp(14),
             size_hint_y=None,
@@ -476,7 +481,7 @@ class DaYanApp(App):
         canvas_container.add_widget(self.straw_canvas)
         main_layout.add_widget(canvas_container)
         
-        # 堆数标签
+        # 堆数标签（根数组合多、少有重复，不进纹理缓存，以免挤掉常用的提示文字）
         self.pile_label = Label(
             text='',
             font_size=sp(14),
@@ -488,7 +493,7 @@ class DaYanApp(App):
         main_layout.add_widget(self.pile_label)
         
         # 提示区
-        self.hint_label = Label(
+        self.hint_label = CachedLabel(
             text='点击"开始"按钮开始起卦',
             font_size=sp(13),
             size_hint_y=None,
@@ -503,11 +508,11 @@ class DaYanApp(App):
         main_layout.add_widget(self.hint_label)
         
         # 结果显示区
-        self.result_label = Label(
+        self.result_label = CachedLabel(
             text='',
             font_size=sp(14),
             size_hint_y=None,
-            height=dp(80),
+            height=dp(100),
             color=(0.1, 0.1, 0.1, 1),
             **font_kwargs
         )
@@ -545,9 +550,21 @@ class DaYanApp(App):
         """更新文本大小"""
         instance.text_size = (instance.width, None)
     
+    def set_label_text(self, label, text):
+        """修改标签文字（下一帧统一写入）"""
+        self._pending_labels[label] = text
+        self._label_trigger()
+    
+    def _flush_labels(self, *args):
+        """写入待更新的标签文字"""
+        pending = self._pending_labels
+        self._pending_labels = {}
+        for label, text in pending.items():
+            label.text = text
+    
     def update_pile_labels(self, left, right):
         """更新堆数标签"""
-        self.pile_label.text = f'左堆: {left}根    右堆: {right}根'
+        self.set_label_text(self.pile_label, f'左堆: {left}根    右堆: {right}根')
     
     def start_divination(self, instance):
         """开始起卦"""
@@ -563,8 +580,8 @@ class DaYanApp(App):
         self.result_changed = None
         self.copy_btn.disabled = True
         self.copy_prompt_btn.disabled = True
-        self.result_label.text = ''
-        self.pile_label.text = ''
+        self.set_label_text(self.result_label, '')
+        self.set_label_text(self.pile_label, '')
         
         # 延迟绘制，确保画布已初始化
         Clock.schedule_once(self._draw_initial, 0.1)
@@ -574,7 +591,7 @@ class DaYanApp(App):
         """延迟绘制初始蓍草"""
         self.straw_canvas.draw_initial_straws()
         self.update_progress()
-        self.hint_label.text = '【第一步：取太极】点击任意一根蓍草取出（共50根，取出1根后剩49根参与演算）'
+        self.set_label_text(self.hint_label, '【第一步：取太极】点击任意一根蓍草取出（共50根，取出1根后剩49根参与演算）')
     
     def update_progress(self):
         """更新进度显示"""
@@ -593,7 +610,7 @@ class DaYanApp(App):
             vals = [f"{yao_names[i]}:{yao_desc[v]}" for i, v in enumerate(self.dayan.yao_values)]
             text += f"  已得: {', '.join(vals)}"
         
-        self.progress_label.text = text
+        self.set_label_text(self.progress_label, text)
     
     def handle_canvas_touch(self, touch):
         """处理画布触摸"""
@@ -619,153 +636,109 @@ class DaYanApp(App):
     
     def select_taiji_straw(self, x, y):
         """选择太极蓍草"""
-        for straw in self.straw_canvas.straw_positions:
-            if (straw['x'] <= x <= straw['x'] + straw['width'] + dp(5) and
-                straw['y'] <= y <= straw['y'] + straw['height']):
-                self.straw_canvas.draw_straws_for_divide(self.dayan.current_straw_count)
-                self.dayan.step = "divide_piles"
-                self.update_progress()
-                self.hint_label.text = '【第二步：分两仪】点击蓍草中间某位置，从该位置将蓍草分成左右两堆'
-                return
+        if self.straw_canvas.hit_pool_straw(x, y):
+            self.straw_canvas.draw_straws_for_divide(self.dayan.current_straw_count)
+            self.dayan.step = "divide_piles"
+            self.update_progress()
+            self.set_label_text(self.hint_label, '【第二步：分两仪】点击蓍草中间某位置，从该位置将蓍草分成左右两堆')
     
     def divide_piles(self, x, y):
         """分蓍草成两堆"""
         total = self.dayan.current_straw_count
         
-        if hasattr(self.straw_canvas, 'divide_straw_positions') and self.straw_canvas.divide_straw_positions:
-            positions = self.straw_canvas.divide_straw_positions
-            left_count = sum(1 for pos in positions if pos < x)
-            
-            if left_count < 1:
-                left_count = 1
-            elif left_count >= total:
-                left_count = total - 1
-            
-            self.dayan.left_pile = left_count
-            self.dayan.right_pile = total - left_count
-        else:
-            self.dayan.left_pile = random.randint(1, total - 1)
-            self.dayan.right_pile = total - self.dayan.left_pile
+        left_count = self.straw_canvas.split_count(x)
+        if left_count is None:
+            left_count = random.randint(1, total - 1)
+        
+        self.dayan.divide(left_count)
         
         self.straw_canvas.draw_two_piles(self.dayan.left_pile, self.dayan.right_pile)
-        self.dayan.step = "take_ren"
         self.update_progress()
-        self.hint_label.text = f'已分两仪：左{self.dayan.left_pile}根，右{self.dayan.right_pile}根。【第三步：挂一】点击【右堆】取一根蓍草象征人'
+        self.set_label_text(self.hint_label, f'已分两仪：左{self.dayan.left_pile}根，右{self.dayan.right_pile}根。【第三步：挂一】点击【右堆】取一根蓍草象征人')
     
     def take_ren_straw(self, x, y):
         """取人蓍草"""
         if not self.straw_canvas.is_in_right_pile(x, y):
-            self.hint_label.text = '请点击【右堆】中的一根蓍草取出作为挂一'
+            self.set_label_text(self.hint_label, '请点击【右堆】中的一根蓍草取出作为挂一')
             return
         
-        self.dayan.right_pile -= 1
-        self.dayan.ren_straw = 1
+        self.dayan.take_ren()
         
-        self.straw_canvas.draw_two_piles(self.dayan.left_pile, self.dayan.right_pile)
-        self.straw_canvas.draw_ren_straw()
+        self.straw_canvas.take_ren_straw(self.dayan.left_pile, self.dayan.right_pile)
         
-        self.dayan.step = "count_left"
         self.update_progress()
-        self.hint_label.text = f'已挂一。【第四步：揲四-左】点击【左堆】，对左堆{self.dayan.left_pile}根以4计数求余'
+        self.set_label_text(self.hint_label, f'已挂一。【第四步：揲四-左】点击【左堆】，对左堆{self.dayan.left_pile}根以4计数求余')
     
     def count_left_pile(self, x, y):
         """数左堆"""
         if not self.straw_canvas.is_in_left_pile(x, y):
-            self.hint_label.text = f'请点击【左堆】进行揲四（左堆共{self.dayan.left_pile}根）'
+            self.set_label_text(self.hint_label, f'请点击【左堆】进行揲四（左堆共{self.dayan.left_pile}根）')
             return
         
-        remainder = self.dayan.left_pile % 4
-        if remainder == 0:
-            remainder = 4
-        self.dayan.left_remainder = remainder
+        remainder = self.dayan.count_left()
         
         self.straw_canvas.highlight_remainder(True, remainder, self.dayan.left_pile)
         
-        # 检查右堆是否为0，如果为0则自动跳过右堆揲四
-        if self.dayan.right_pile == 0:
-            self.dayan.right_remainder = 0
-            total_remainder = self.dayan.left_remainder + self.dayan.right_remainder + self.dayan.ren_straw
-            self.dayan.bian_remainders.append(total_remainder)
-            self.dayan.current_straw_count -= total_remainder
-            
-            self.dayan.step = "complete_bian"
+        # 右堆为0时已自动跳过右堆揲四并归奇
+        if self.dayan.step == "complete_bian":
+            total_remainder = self.dayan.bian_remainders[-1]
             bian_num = self.dayan.current_bian + 1
             yao_names = ["初爻", "二爻", "三爻", "四爻", "五爻", "上爻"]
             yao_name = yao_names[self.dayan.current_yao]
             
             self.update_progress()
-            self.hint_label.text = (
+            self.set_label_text(self.hint_label, (
                 f'左堆{self.dayan.left_pile}÷4余{self.dayan.left_remainder}根，右堆为0根无需揲四 → '
                 f'【归奇】左余{self.dayan.left_remainder}+右余0+挂一={total_remainder}根放一旁，'
                 f'剩余{self.dayan.current_straw_count}根。点击完成{yao_name}第{bian_num}变'
-            )
+            ))
             return
         
-        self.dayan.step = "count_right"
         self.update_progress()
-        self.hint_label.text = f'左堆{self.dayan.left_pile}÷4余{remainder}根。【第五步：揲四-右】点击【右堆】，对右堆{self.dayan.right_pile}根以4计数求余'
+        self.set_label_text(self.hint_label, f'左堆{self.dayan.left_pile}÷4余{remainder}根。【第五步：揲四-右】点击【右堆】，对右堆{self.dayan.right_pile}根以4计数求余')
     
     def count_right_pile(self, x, y):
         """数右堆"""
         if not self.straw_canvas.is_in_right_pile(x, y):
-            self.hint_label.text = f'请点击【右堆】进行揲四（右堆共{self.dayan.right_pile}根）'
+            self.set_label_text(self.hint_label, f'请点击【右堆】进行揲四（右堆共{self.dayan.right_pile}根）')
             return
         
-        remainder = self.dayan.right_pile % 4
-        if remainder == 0:
-            remainder = 4
-        self.dayan.right_remainder = remainder
+        remainder = self.dayan.count_right()
         
         self.straw_canvas.highlight_remainder(False, remainder, self.dayan.right_pile)
         
-        total_remainder = self.dayan.left_remainder + self.dayan.right_remainder + self.dayan.ren_straw
-        self.dayan.bian_remainders.append(total_remainder)
-        self.dayan.current_straw_count -= total_remainder
-        
-        self.dayan.step = "complete_bian"
+        total_remainder = self.dayan.bian_remainders[-1]
         bian_num = self.dayan.current_bian + 1
         yao_names = ["初爻", "二爻", "三爻", "四爻", "五爻", "上爻"]
         yao_name = yao_names[self.dayan.current_yao]
         
         self.update_progress()
-        self.hint_label.text = (
+        self.set_label_text(self.hint_label, (
             f'右堆{self.dayan.right_pile}÷4余{self.dayan.right_remainder}根 → '
             f'【归奇】左余{self.dayan.left_remainder}+右余{self.dayan.right_remainder}+挂一={total_remainder}根放一旁，'
             f'剩余{self.dayan.current_straw_count}根。点击完成{yao_name}第{bian_num}变'
-        )
+        ))
     
     def complete_bian(self):
         """完成一变"""
-        self.dayan.current_bian += 1
         yao_names = ["初爻", "二爻", "三爻", "四爻", "五爻", "上爻"]
+        yao_name = yao_names[self.dayan.current_yao]
+        yao_value = self.dayan.complete_bian()
         
-        if self.dayan.current_bian < 3:
-            self.dayan.step = "divide_piles"
-            bian_num = self.dayan.current_bian + 1
-            yao_name = yao_names[self.dayan.current_yao]
+        if yao_value is None:
             bian_names = ["一变", "二变", "三变"]
             
             self.straw_canvas.draw_straws_for_divide(self.dayan.current_straw_count)
             self.update_progress()
-            self.hint_label.text = f'【{yao_name}·{bian_names[self.dayan.current_bian]}】剩余{self.dayan.current_straw_count}根蓍草。点击蓍草中间某位置分两仪'
+            self.set_label_text(self.hint_label, f'【{yao_name}·{bian_names[self.dayan.current_bian]}】剩余{self.dayan.current_straw_count}根蓍草。点击蓍草中间某位置分两仪')
         else:
-            yao_value = self.dayan.current_straw_count // 4
-            self.dayan.yao_values.append(yao_value)
-            
             yao_desc = {6: "老阴（⚋变⚊）", 7: "少阳（⚊不变）", 8: "少阴（⚋不变）", 9: "老阳（⚊变⚋）"}
             yao_name_result = yao_desc.get(yao_value, "")
-            yao_name = yao_names[self.dayan.current_yao]
-            
-            self.dayan.current_yao += 1
             
             if self.dayan.current_yao < 6:
-                self.dayan.current_bian = 0
-                self.dayan.bian_remainders = []
-                self.dayan.current_straw_count = 49
-                self.dayan.step = "next_yao"
                 next_yao_name = yao_names[self.dayan.current_yao]
                 self.update_progress()
-                self.hint_label.text = f'【{yao_name}完成】三变后剩{yao_value * 4}根÷4={yao_value}，得{yao_name_result}。点击开始求【{next_yao_name}】'
+                self.set_label_text(self.hint_label, f'【{yao_name}完成】三变后剩{yao_value * 4}根÷4={yao_value}，得{yao_name_result}。点击开始求【{next_yao_name}】')
             else:
                 self.update_progress()
                 self.complete_divination()
@@ -778,18 +751,13 @@ class DaYanApp(App):
         
         self.straw_canvas.draw_straws_for_divide(self.dayan.current_straw_count)
         self.update_progress()
-        self.hint_label.text = f'【{yao_name}·一变】重新取49根蓍草。点击蓍草中间某位置分两仪'
+        self.set_label_text(self.hint_label, f'【{yao_name}·一变】重新取49根蓍草。点击蓍草中间某位置分两仪')
     
     def complete_divination(self):
         """完成起卦"""
         self.is_started = False
         
-        self.result_original = self.dayan.get_hexagram_info(self.dayan.yao_values, True)
-        
-        if self.dayan.has_bian_yao(self.dayan.yao_values):
-            self.result_changed = self.dayan.get_hexagram_info(self.dayan.yao_values, False)
-        else:
-            self.result_changed = None
+        self.result_original, self.result_changed = self.dayan.get_result(self.dayan.yao_values)
         
         self.straw_canvas.draw_result(self.result_original, self.result_changed, self.dayan.yao_values)
         
@@ -806,92 +774,239 @@ class DaYanApp(App):
         else:
             result_text += "\n之卦：无"
         
-        self.result_label.text = result_text
-        self.hint_label.text = '起卦完成！可点击下方按钮复制结果'
+        result_text += "\n" + self.format_related(self.result_original["code"])
+        
+        self.set_label_text(self.result_label, result_text)
+        self.set_label_text(self.hint_label, '起卦完成！可点击下方按钮复制结果')
         
         self.save_to_history()
         
         self.copy_btn.disabled = False
         self.copy_prompt_btn.disabled = False
     
+    def format_related(self, code):
+        """互卦、错卦、综卦的文本"""
+        related = self.dayan.get_related_hexagrams(code)
+        return (
+            f"互卦：{related['nuclear']['xiang']}{related['nuclear']['name']}  "
+            f"错卦：{related['complement']['xiang']}{related['complement']['name']}  "
+            f"综卦：{related['reversed']['xiang']}{related['reversed']['name']}"
+        )
+    
     def save_to_history(self):
         """保存到历史"""
-        record = {
-            "question": self.current_question,
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "yao_values": self.dayan.yao_values,
-            "original_name": self.result_original["name"] if self.result_original else "",
-            "original_xiang": self.result_original["xiang"] if self.result_original else "",
-            "original_symbols": "".join(self.result_original["symbols"]) if self.result_original else "",
-        }
+        record = make_record(
+            self.current_question,
+            datetime.now().strftime(DATE_FORMAT),
+            self.dayan.yao_values,
+        )
         
-        if self.result_changed:
-            record["changed_name"] = self.result_changed["name"]
-            record["changed_xiang"] = self.result_changed["xiang"]
-            record["changed_symbols"] = "".join(self.result_changed["symbols"])
+        if self.history_state == "ready":
+            self.history_data.append(HistoryRecord.from_dict(record))
         else:
-            record["changed_name"] = ""
-            record["changed_xiang"] = ""
-            record["changed_symbols"] = ""
-        
-        self.history_data.append(record)
-        self.save_history()
-    
-    def load_history(self):
-        """加载历史"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
-    
-    def save_history(self):
-        """保存历史"""
+            self.history_pending.append(HistoryRecord.from_dict(record))
+        self.history_writer.submit(record)
+        self.stats.add(record)
+    
+    def _on_history_error(self, error):
+        """后台写入失败时回到界面线程提示"""
+        Clock.schedule_once(lambda dt: self.show_popup("提示", f"保存历史失败: {error}"))
+    
+    def on_pause(self):
+        """切到后台前写完历史"""
+        self.history_writer.flush()
+        self.save_stats()
+        return True
+    
+    def on_resume(self):
+        """回到前台后GL上下文可能已重建，丢弃缓存的文字纹理"""
+        CachedLabel.clear_cache()
+        for label in (self.progress_label, self.pile_label, self.hint_label, self.result_label):
+            label.texture_update()
+    
+    def on_stop(self):
+        """退出前写完历史"""
+        self.history_writer.close()
+        self.save_stats()
+    
+    def save_stats(self):
+        """保存统计"""
         try:
-            with open(self.history_file, "w", encoding="utf-8") as f:
-                json.dump(self.history_data, f, ensure_ascii=False, indent=2)
+            self.stats.save(self.stats_file)
         except Exception as e:
-            print(f"保存历史失败: {e}")
+            Logger.warning(f"DaYan: 保存统计失败: {e}")
+    
+    def prepare_history(self):
+        """修复当前段残缺的末行（开销与历史条数无关），迁移与索引重建在后台加载时进行"""
+        try:
+            self.history_store.repair()
+        except Exception as e:
+            Logger.warning(f"DaYan: 加载历史失败: {e}")
+    
+    def on_start(self):
+        """首帧之后开始后台加载历史"""
+        Clock.schedule_once(self._start_history_load, 0.1)
+    
+    def _start_history_load(self, dt):
+        """启动历史加载线程"""
+        self.history_state = "loading"
+        threading.Thread(target=self._load_history_worker, daemon=True).start()
+    
+    def _load_history_worker(self):
+        """后台线程：迁移旧版历史、读取索引后逐块解析，交回界面线程合并"""
+        try:
+            self.history_store.prepare()
+            for chunk in self.history_store.iter_chunks():
+                Clock.schedule_once(partial(self._on_history_chunk, compact_records(chunk)))
+        except Exception as e:
+            message = f"加载历史失败: {e}"
+            Clock.schedule_once(lambda dt: self.show_popup("提示", message))
+        Clock.schedule_once(self._on_history_loaded)
+    
+    def _on_history_chunk(self, chunk, dt):
+        """追加一块已加载的历史"""
+        self.history_data.extend(chunk)
+    
+    def _on_history_loaded(self, dt):
+        """历史加载完成，把加载期间新保存的记录接在末尾
+
+        加载线程取快照前已写入的新记录已在加载结果中，不再重复加入
+        """
+        loaded = Counter()
+        for record in reversed(self.history_data):
+            if record.get('date', '') < self.history_session_start:
+                break
+            loaded[self.history_key(record)] += 1
+        for record in self.history_pending:
+            key = self.history_key(record)
+            if loaded[key]:
+                loaded[key] -= 1
+            else:
+                self.history_data.append(record)
+        self.history_pending = []
+        self.history_state = "ready"
+        self._refresh_history_view()
+        if self.stats.total != len(self.history_data):
+            self.stats = HistoryStats.rebuild(self.history_data)
+            self.save_stats()
+        threading.Thread(target=self._compact_history_worker, daemon=True).start()
+    
+    @staticmethod
+    def history_key(record):
+        """区分记录的键：（起卦时间, 求卦事项, 爻值）"""
+        return record.get('date', ''), record.get('question', ''), tuple(record.get('yao_values', []))
+    
+    def _compact_history_worker(self):
+        """后台线程：合并小段，归档一年前的历史"""
+        archive_before = (datetime.now() - timedelta(days=365)).strftime(DATE_FORMAT)
+        try:
+            self.history_store.compact_segments(archive_before=archive_before)
+        except Exception as e:
+            Logger.warning(f"DaYan: 压缩历史失败: {e}")
     
     def show_history(self, instance):
-        """显示历史记录"""
-        if not self.history_data:
-            self.show_popup("提示", "暂无历史记录")
+        """显示历史记录（加载中时显示已加载的部分）"""
+        if not self.history_data and not self.history_pending:
+            if self.history_state == "ready":
+                self.show_popup("提示", "暂无历史记录")
+            else:
+                self.show_popup("提示", "历史记录加载中，请稍候")
             return
         
         content = BoxLayout(orientation='vertical', spacing=dp(5), padding=dp(10))
         
-        scroll = ScrollView(size_hint=(1, 0.9))
-        history_list = BoxLayout(orientation='vertical', size_hint_y=None, spacing=dp(5))
+        # 只创建可见行数的控件，数据按页从新到旧懒加载
+        history_view = RecycleView(size_hint=(1, 0.9), viewclass=HistoryRow)
+        history_list = RecycleBoxLayout(
+            orientation='vertical',
+            size_hint_y=None,
+            spacing=dp(5),
+            default_size=(None, dp(40)),
+            default_size_hint=(1, None),
+        )
         history_list.bind(minimum_height=history_list.setter('height'))
-        
-        for item in sorted(self.history_data, key=lambda x: x.get("date", ""), reverse=True):
-            btn = Button(
-                text=f"{item.get('question', '未知')} - {item.get('original_name', '')}",
-                size_hint_y=None,
-                height=dp(40),
-                font_size=sp(14),
-                **self.font_kwargs
-            )
-            btn.item = item
-            btn.bind(on_press=self.show_history_detail)
-            history_list.add_widget(btn)
-        
-        scroll.add_widget(history_list)
-        content.add_widget(scroll)
-        
-        close_btn = Button(text='关闭', size_hint_y=None, height=dp(40), **self.font_kwargs)
-        content.add_widget(close_btn)
-        
-        popup = Popup(title='历史记录', content=content, size_hint=(0.9, 0.8))
+        history_view.add_widget(history_list)
+        self._snapshot_history(history_view)
+        history_view.data = self.history_page(history_view, 0, HISTORY_PAGE_SIZE)
+        history_view.bind(scroll_y=self._on_history_scroll)
+        content.add_widget(history_view)
+        
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(10))
+        stats_btn = Button(text='统计', on_press=self.show_stats, **self.font_kwargs)
+        close_btn = Button(text='关闭', **self.font_kwargs)
+        btn_layout.add_widget(stats_btn)
+        btn_layout.add_widget(close_btn)
+        content.add_widget(btn_layout)
+        
+        title = '历史记录' if self.history_state == "ready" else '历史记录（加载中…）'
+        popup = Popup(title=title, content=content, size_hint=(0.9, 0.8))
+        popup.history_view = history_view
         close_btn.bind(on_press=popup.dismiss)
+        popup.bind(on_dismiss=self._on_history_dismiss)
+        self.history_popup = popup
         popup.open()
     
+    def _on_history_dismiss(self, popup):
+        """历史列表关闭"""
+        self.history_popup = None
+    
+    def _refresh_history_view(self):
+        """加载完成后按完整历史重新显示已打开的列表"""
+        popup = self.history_popup
+        if popup is None:
+            return
+        view = popup.history_view
+        shown = max(len(view.data), HISTORY_PAGE_SIZE)
+        self._snapshot_history(view)
+        view.data = self.history_page(view, 0, shown)
+        popup.title = '历史记录'
+    
+    def _snapshot_history(self, view):
+        """记下列表打开时的历史条数，之后按此快照分页，加载中追加的记录不影响已显示的行"""
+        view.history_end = len(self.history_data)
+        view.history_pending = list(self.history_pending)
+    
+    def history_page(self, view, offset, limit):
+        """从新到旧取一页历史列表数据（记录按时间顺序追加，无需排序）
+
+        新到旧依次为加载期间新保存的记录、history_data[:history_end]
+        """
+        pending = view.history_pending
+        stop = min(offset + limit, len(pending) + view.history_end)
+        rows = []
+        for i in range(offset, stop):
+            if i < len(pending):
+                record = pending[-1 - i]
+            else:
+                record = self.history_data[view.history_end - 1 - (i - len(pending))]
+            rows.append({
+                'text': f"{record.get('question', '未知')} - {record.get('original_name', '')}",
+                'record': record,
+            })
+        return rows
+    
+    def _on_history_scroll(self, view, scroll_y):
+        """滚动接近底部时加载下一页"""
+        if scroll_y <= 0.1 and len(view.data) < len(view.history_pending) + view.history_end:
+            view.data.extend(self.history_page(view, len(view.data), HISTORY_PAGE_SIZE))
+    
+    def show_stats(self, instance):
+        """显示历史统计（读取增量统计，不扫描历史）"""
+        stats = self.stats
+        yao_names = ["初爻", "二爻", "三爻", "四爻", "五爻", "上爻"]
+        today = datetime.now().strftime("%Y-%m-%d")
+        
+        text = f"起卦总数: {stats.total}    今日: {stats.daily_counts.get(today, 0)}\n"
+        text += f"起卦天数: {len(stats.daily_counts)}\n\n"
+        text += "本卦最多: " + "、".join(f"{name}{count}次" for name, count in stats.top_hexagrams()) + "\n"
+        text += "之卦最多: " + "、".join(f"{name}{count}次" for name, count in stats.top_hexagrams(changed=True)) + "\n\n"
+        text += "动爻次数: " + "、".join(f"{yao_names[i]}{count}" for i, count in enumerate(stats.moving_counts))
+        
+        self.show_popup("历史统计", text)
+    
     def show_history_detail(self, instance):
         """显示历史详情"""
-        item = instance.item
+        item = instance.record
         
         detail = f"求卦事项: {item.get('question', '')}\n"
         detail += f"起卦时间: {item.get('date', '')}\n\n"
@@ -902,6 +1017,10 @@ class DaYanApp(App):
         else:
             detail += "无变卦"
         
+        original, _ = self.dayan.get_result(item.get('yao_values', []))
+        if original:
+            detail += "\n" + self.format_related(original["code"])
+        
         self.show_popup("卦象详情", detail)
     
     def copy_result(self, instance):
@@ -910,6 +1029,7 @@ class DaYanApp(App):
             self.show_popup("提示", "暂无卦象结果可复制")
             return
         
+        self._flush_labels()
         text = self.result_label.text
         Clipboard.copy(text)
         self.show_popup("提示", "卦象已复制到剪贴板")
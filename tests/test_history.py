@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""JsonlHistoryStore：旧版迁移、残缺末行修复、流式读取"""
+
+import json
+import os
+
+from dayanshifa.core import make_record
+from dayanshifa.history import JsonlHistoryStore, dump_record
+
+
+def _records(n, month="2024-05"):
+    return [make_record(f"q{i}", f"{month}-01 10:00:{i % 60:02d}", [7, 8, 9, 6, 7, 8]) for i in range(n)]
+
+
+def test_migrate_legacy_json_array(tmp_path):
+    legacy = tmp_path / "history.json"
+    records = _records(3)
+    legacy.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    store = JsonlHistoryStore(str(tmp_path / "history.jsonl"), str(legacy))
+
+    assert store.load() == records
+    assert not legacy.exists()
+    assert (tmp_path / "history.json.bak").exists()
+
+
+def test_migrate_skips_when_jsonl_exists(tmp_path):
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps(_records(2)), encoding="utf-8")
+    store = JsonlHistoryStore(str(tmp_path / "history.jsonl"), str(legacy))
+    store.append(_records(1)[0])
+
+    assert store.migrate_legacy() is False
+    assert legacy.exists()
+
+
+def test_prepare_truncates_torn_tail(tmp_path):
+    path = tmp_path / "history.jsonl"
+    records = _records(2)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(dump_record(r) for r in records))
+        f.write('{"question": "写了一半')
+    store = JsonlHistoryStore(str(path))
+
+    store.prepare()
+
+    assert path.read_bytes().endswith(b"\n")
+    assert store.load() == records
+    store.append(_records(3)[2])
+    assert len(store.load()) == 3
+
+
+def test_prepare_truncates_file_without_newline(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_bytes(b'{"question"' * 1000)
+
+    JsonlHistoryStore(str(path)).prepare()
+
+    assert os.path.getsize(path) == 0
+
+
+def test_iter_chunks_skips_bad_lines_and_bounds_reads(tmp_path):
+    path = tmp_path / "history.jsonl"
+    records = _records(5)
+    store = JsonlHistoryStore(str(path))
+    store.append_many(records[:3])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\nnot json\n")
+    end = os.path.getsize(path)
+    store.append_many(records[3:])
+
+    chunks = list(store.iter_chunks(chunk_size=2))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert [r for c in chunks for r in c] == records
+    assert [r for c in store.iter_chunks(end=end) for r in c] == records[:3]
+
+
+def test_compact_rewrites_atomically(tmp_path):
+    path = tmp_path / "history.jsonl"
+    store = JsonlHistoryStore(str(path))
+    store.append_many(_records(4))
+
+    store.compact(_records(2))
+
+    assert store.load() == _records(2)
+    assert not (tmp_path / "history.jsonl.tmp").exists()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""历史导入导出：格式识别、记录校验、去重与按日期插入"""
+
+import gzip
+import json
+
+from dayanshifa.core import make_record
+from dayanshifa.history_io import (
+    detect_format, export_history, import_history, iter_file, iter_store, open_store, validate_record,
+)
+
+
+def _record(question, date, yao_values=(7, 8, 9, 6, 7, 8)):
+    return make_record(question, date, list(yao_values))
+
+
+def _write_jsonl(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write((line if isinstance(line, str) else json.dumps(line, ensure_ascii=False)) + "\n")
+
+
+def test_detect_format():
+    assert detect_format("a.csv") == "csv"
+    assert detect_format("a.CSV.gz") == "csv"
+    assert detect_format("a.jsonl.gz") == "jsonl"
+    assert detect_format("-") == "jsonl"
+
+
+def test_validate_record():
+    good = _record("a", "2024-05-01 10:00:00")
+    assert validate_record(good) is good
+    assert validate_record({"date": "2024-05-01 10:00:00", "yao_values": [7, 8, 9, 6, 7, 8]}) == \
+        _record("", "2024-05-01 10:00:00")
+    assert validate_record(_record("a", "../../x 10:00")) is None
+    assert validate_record(_record("a", "2024/05/01")) is None
+    assert validate_record({"question": "a", "yao_values": [7, 8, 9, 6, 7, 8]}) is None
+    assert validate_record(_record("a", "2024-05-01 10:00:00", (7, 8, 9))) is None
+    assert validate_record({"date": "2024-05-01 10:00:00", "yao_values": "789678"}) is None
+
+
+def test_iter_jsonl_skips_non_objects(tmp_path):
+    path = tmp_path / "in.jsonl"
+    _write_jsonl(path, ["42", "[1]", "not json", "", _record("a", "2024-05-01 10:00:00")])
+
+    assert [r["question"] for r in iter_file(str(path))] == ["a"]
+
+
+def test_import_skips_invalid_and_duplicates(tmp_path):
+    store = open_store(str(tmp_path / "history"))
+    store.append(_record("existing", "2024-05-01 10:00:00"))
+    path = tmp_path / "in.jsonl"
+    _write_jsonl(path, [
+        "42",
+        _record("existing", "2024-05-01 10:00:00"),
+        _record("new", "2024-05-02 10:00:00"),
+        _record("new", "2024-05-02 10:00:00"),
+        _record("bad", "../../x 10:00"),
+        {"date": "2024-05-03 10:00:00", "yao_values": [7, 8, 7, 8, 7, 5]},
+    ])
+
+    assert import_history(store, str(path)) == (1, 4)
+    assert [r["question"] for r in iter_store(store)] == ["existing", "new"]
+    assert not (tmp_path / "x.000000.jsonl").exists()
+
+
+def test_import_keeps_time_order(tmp_path):
+    store = open_store(str(tmp_path / "history"))
+    store.append_many([_record(f"q{d}", f"2024-05-{d:02d} 10:00:00") for d in range(1, 6)])
+    path = tmp_path / "in.jsonl"
+    _write_jsonl(path, [_record("old", "2020-01-01 00:00:00"), _record("mid", "2024-05-03 12:00:00")])
+
+    import_history(store, str(path), chunk_size=1)
+
+    records = list(iter_store(store))
+    assert [r["date"] for r in records] == sorted(r["date"] for r in records)
+    assert records[0]["question"] == "old"
+
+
+def test_export_import_round_trip_csv_gz(tmp_path):
+    source = open_store(str(tmp_path / "source"))
+    records = [_record(f"问{i}, \"引号\"", f"2024-05-{1 + i:02d} 10:00:00") for i in range(5)]
+    source.append_many(records)
+    out = str(tmp_path / "backup.csv.gz")
+
+    assert export_history(source, out) == 5
+    with gzip.open(out, "rt", encoding="utf-8") as f:
+        assert f.readline().startswith("question,date,yao_values")
+
+    target = open_store(str(tmp_path / "target.jsonl"))
+    assert import_history(target, out) == (5, 0)
+    assert import_history(target, out) == (0, 5)
+    assert list(iter_store(target)) == records
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""SegmentedHistoryStore：迁移、残缺末行、快照查询、合并归档、按日期插入"""
+
+import json
+import os
+
+import pytest
+
+from dayanshifa.core import make_record
+from dayanshifa.history import JsonlHistoryStore
+from dayanshifa.history_segments import UNKNOWN_MONTH, SegmentedHistoryStore
+
+
+def _record(question, date):
+    return make_record(question, date, [7, 8, 9, 6, 7, 8])
+
+
+def _month_records(month, n, prefix="q"):
+    return [_record(f"{prefix}{i}", f"{month}-{1 + i % 28:02d} 10:00:00") for i in range(n)]
+
+
+def _all(store):
+    return [r for chunk in store.iter_chunks() for r in chunk]
+
+
+def _store(tmp_path, **kwargs):
+    store = SegmentedHistoryStore(str(tmp_path / "history"), **kwargs)
+    store.prepare()
+    return store
+
+
+def test_appends_rotate_by_month_and_size(tmp_path):
+    store = _store(tmp_path, max_segment_bytes=2000)
+    records = _month_records("2024-05", 20) + _month_records("2024-06", 3)
+    store.append_many(records)
+
+    segments = store.segments()
+    assert len(segments) > 2
+    assert {s["name"].split(".")[0] for s in segments} == {"2024-05", "2024-06"}
+    assert sum(s["count"] for s in segments) == 23
+    assert _all(store) == records
+
+
+def test_unparsable_dates_stay_inside_the_store(tmp_path):
+    store = _store(tmp_path)
+    store.append_many([_record("a", "../../x 10:00"), _record("b", "2024/05/01")])
+
+    assert [s["name"].split(".")[0] for s in store.segments()] == [UNKNOWN_MONTH]
+    assert not (tmp_path / "x.000000.jsonl").exists()
+    assert len(_all(store)) == 2
+
+
+def test_failed_write_only_indexes_written_segments(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    store.append_many(_month_records("2024-05", 2))
+
+    def failing_open(path, *args, **kwargs):
+        if os.path.basename(path).startswith("2024-06"):
+            raise OSError("disk full")
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr("dayanshifa.history_segments.open", failing_open, raising=False)
+    with pytest.raises(OSError):
+        store.append_many(_month_records("2024-05", 1, "may") + _month_records("2024-06", 1))
+    monkeypatch.undo()
+
+    segments = store.segments()
+    assert [s["name"].split(".")[0] for s in segments] == ["2024-05"]
+    assert segments[0]["count"] == 3
+    assert [s["count"] for s in _store(tmp_path).segments()] == [3]
+
+
+def test_legacy_migration(tmp_path):
+    legacy_path = tmp_path / "history.jsonl"
+    legacy = JsonlHistoryStore(str(legacy_path))
+    records = _month_records("2024-05", 10) + _month_records("2024-06", 10)
+    legacy.append_many(records)
+
+    store = _store(tmp_path, legacy_store=JsonlHistoryStore(str(legacy_path)))
+
+    assert _all(store) == records
+    assert not legacy_path.exists()
+    assert (tmp_path / "history.jsonl.bak").exists()
+
+
+def test_interrupted_migration_is_redone(tmp_path):
+    legacy_path = tmp_path / "history.jsonl"
+    records = _month_records("2024-05", 1200)
+    JsonlHistoryStore(str(legacy_path)).append_many(records)
+
+    store = SegmentedHistoryStore(str(tmp_path / "history"), JsonlHistoryStore(str(legacy_path)))
+    original = store._append_many
+    calls = []
+
+    def crash_on_second_chunk(chunk):
+        calls.append(len(chunk))
+        if len(calls) == 2:
+            raise RuntimeError("crash")
+        original(chunk)
+
+    store._append_many = crash_on_second_chunk
+    with pytest.raises(RuntimeError):
+        store.prepare()
+    assert legacy_path.exists()
+
+    store = _store(tmp_path, legacy_store=JsonlHistoryStore(str(legacy_path)))
+    assert _all(store) == records
+    assert (tmp_path / "history.jsonl.bak").exists()
+
+
+def test_repair_and_prepare_fix_torn_tail(tmp_path):
+    store = _store(tmp_path)
+    records = _month_records("2024-05", 3)
+    store.append_many(records)
+    path = tmp_path / "history" / store.segments()[-1]["name"]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"question": "写了一半')
+
+    SegmentedHistoryStore(str(tmp_path / "history")).repair()
+    assert path.read_bytes().endswith(b"\n")
+
+    store = _store(tmp_path)
+    store.append_many(_month_records("2024-05", 1, "new"))
+    assert len(_all(store)) == 4
+
+
+def test_prepare_rescans_unindexed_appends(tmp_path):
+    store = _store(tmp_path)
+    store.append_many(_month_records("2024-05", 2))
+    path = tmp_path / "history" / store.segments()[-1]["name"]
+    # 追加后、写索引前中断
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(_record("lost", "2024-05-20 10:00:00"), ensure_ascii=False) + "\n")
+
+    store = _store(tmp_path)
+    assert store.segments()[-1]["count"] == 3
+    assert store.segments()[-1]["end"] == "2024-05-20 10:00:00"
+
+
+def test_missing_index_is_rebuilt_in_date_order(tmp_path):
+    store = _store(tmp_path)
+    store.append_many(_month_records("2024-06", 2))
+    store.append_many(_month_records("2024-05", 2))
+    os.remove(tmp_path / "history" / "index.json")
+
+    store = _store(tmp_path)
+    dates = [r["date"] for r in _all(store)]
+    assert dates == sorted(dates)
+
+
+def test_append_many_prepares_on_demand(tmp_path):
+    store = _store(tmp_path)
+    store.append_many(_month_records("2024-05", 2))
+
+    fresh = SegmentedHistoryStore(str(tmp_path / "history"))
+    fresh.append_many(_month_records("2024-05", 1, "new"))
+
+    assert len(fresh.segments()) == 1
+    assert len(_all(fresh)) == 3
+
+
+def test_query_returns_only_records_present_at_snapshot(tmp_path):
+    store = _store(tmp_path)
+    records = _month_records("2024-05", 1200)
+    store.append_many(records)
+
+    seen = []
+    for chunk in store.iter_chunks(chunk_size=500):
+        seen.extend(chunk)
+        store.append(_record("late", "2024-05-28 23:00:00"))
+    assert seen == records
+    assert len(_all(store)) == 1203
+
+
+def test_query_by_date_range(tmp_path):
+    store = _store(tmp_path)
+    store.append_many(_month_records("2024-04", 5) + _month_records("2024-05", 5)
+                      + _month_records("2024-06", 5))
+
+    may = [r for chunk in store.query("2024-05", "2024-05") for r in chunk]
+    assert len(may) == 5
+    assert all(r["date"].startswith("2024-05") for r in may)
+    later = [r for chunk in store.query(start="2024-05-03") for r in chunk]
+    assert all(r["date"] >= "2024-05-03" for r in later)
+
+
+def test_compact_segments_merges_and_archives(tmp_path):
+    store = _store(tmp_path)
+    records = []
+    for month in ("2023-01", "2023-02", "2023-03", "2024-05"):
+        batch = _month_records(month, 5)
+        store.append_many(batch)
+        records.extend(batch)
+
+    store.compact_segments(archive_before="2024-01-01 00:00:00")
+
+    segments = store.segments()
+    assert len(segments) == 2
+    assert segments[0]["archived"] and segments[0]["name"].endswith(".gz")
+    assert not segments[-1]["archived"]
+    assert _all(store) == records
+    names = set(os.listdir(tmp_path / "history")) - {"index.json"}
+    assert names == {s["name"] for s in segments}
+
+
+def test_compact_tolerates_missing_segment_files(tmp_path):
+    store = _store(tmp_path)
+    store.append_many(_month_records("2024-05", 2) + _month_records("2024-06", 2))
+    os.remove(tmp_path / "history" / store.segments()[0]["name"])
+
+    store.compact(_month_records("2024-07", 1))
+
+    assert len(_all(store)) == 1
+
+
+def test_insert_many_keeps_time_order(tmp_path):
+    store = _store(tmp_path)
+    store.append_many(_month_records("2024-05", 10) + _month_records("2024-06", 2))
+
+    store.insert_many([_record("old", "2020-01-01 00:00:00"),
+                       _record("mid", "2024-05-05 12:00:00"),
+                       _record("new", "2025-01-01 00:00:00")])
+
+    records = _all(store)
+    dates = [r["date"] for r in records]
+    assert dates == sorted(dates)
+    assert records[0]["question"] == "old" and records[-1]["question"] == "new"
+    assert len(records) == 15
+    names = set(os.listdir(tmp_path / "history")) - {"index.json"}
+    assert names == {s["name"] for s in store.segments()}
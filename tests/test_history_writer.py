@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""HistoryWriter：合并写入、队列满时不阻塞、写入失败回调"""
+
+import threading
+import time
+
+from dayanshifa.history import HistoryWriter
+
+
+class SlowStore:
+    """每次写入都等待一段时间的存储，记录每批的大小"""
+
+    def __init__(self, delay=0.0, gate=None):
+        self.delay = delay
+        self.gate = gate
+        self.records = []
+        self.batches = []
+
+    def append_many(self, records):
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.delay)
+        self.batches.append(len(records))
+        self.records.extend(records)
+
+
+def test_submit_does_not_block_when_queue_is_full():
+    gate = threading.Event()
+    store = SlowStore(gate=gate)
+    writer = HistoryWriter(store, maxsize=2)
+
+    start = time.monotonic()
+    for i in range(100):
+        writer.submit(i)
+    elapsed = time.monotonic() - start
+    gate.set()
+    writer.close()
+
+    assert elapsed < 0.5
+    assert store.records == list(range(100))
+
+
+def test_backlog_is_coalesced_into_batches():
+    gate = threading.Event()
+    store = SlowStore(gate=gate)
+    writer = HistoryWriter(store, maxsize=8)
+    for i in range(50):
+        writer.submit(i)
+    gate.set()
+    writer.flush()
+
+    assert store.records == list(range(50))
+    assert len(store.batches) < 50
+    writer.close()
+
+
+def test_flush_waits_for_overflow_records():
+    store = SlowStore(delay=0.01)
+    writer = HistoryWriter(store, maxsize=1)
+    for i in range(20):
+        writer.submit(i)
+    writer.flush()
+
+    assert store.records == list(range(20))
+    writer.close()
+
+
+def test_errors_go_to_callback_and_writer_keeps_running():
+    errors = []
+
+    class FailingOnce:
+        def __init__(self):
+            self.records = []
+            self.failed = False
+
+        def append_many(self, records):
+            if not self.failed:
+                self.failed = True
+                raise OSError("disk full")
+            self.records.extend(records)
+
+    store = FailingOnce()
+    writer = HistoryWriter(store, on_error=errors.append)
+    writer.submit("a")
+    writer.flush()
+    writer.submit("b")
+    writer.close()
+
+    assert [str(e) for e in errors] == ["disk full"]
+    assert store.records == ["b"]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""蓍草布局：算术点击检测与逐根扫描一致"""
+
+import random
+
+from dayanshifa.layout import PILE_ROW_SIZE, PileLayout, RowLayout, scene_layout
+
+
+def _contains(rect, px, py, slop):
+    x, y, w, h = rect
+    return x <= px <= x + w + slop and y <= py <= y + h
+
+
+def test_row_index_at_matches_scan():
+    rng = random.Random(0)
+    for slop in (0, 4, 10):
+        row = RowLayout(37.5, 120.0, 10.0, 4.0, 50.0, 50)
+        rects = row.rects()
+        for _ in range(20000):
+            px = rng.uniform(row.x - 20, row.x + row.width + 20)
+            py = rng.uniform(row.y - 10, row.y + row.straw_height + 10)
+            hit = row.index_at(px, py, slop)
+            if hit < 0:
+                assert not any(_contains(r, px, py, slop) for r in rects)
+            else:
+                assert _contains(rects[hit], px, py, slop)
+
+
+def test_row_split_count_matches_scan():
+    rng = random.Random(1)
+    row = RowLayout(10.0, 0.0, 8.0, 3.0, 45.0, 48)
+    for _ in range(20000):
+        px = rng.uniform(0, row.x + row.width + 10)
+        assert row.split_count(px) == sum(1 for c in row.centers if c < px)
+
+
+def test_pile_index_at_matches_scan():
+    rng = random.Random(2)
+    pile = PileLayout(20.0, 300.0, 6.0, 3.0, 40.0, 5.0, 48)
+    for count in (0, 1, 14, 15, 16, 31, 48):
+        rects = pile.rects(0, count)
+        for _ in range(5000):
+            px = rng.uniform(0, pile.x + PILE_ROW_SIZE * pile.spacing + 20)
+            py = rng.uniform(pile.y - 4 * pile.row_step, pile.y + pile.straw_height + 10)
+            hit = pile.index_at(px, py, count, 10)
+            if hit < 0:
+                assert not any(_contains(r, px, py, 10) for r in rects)
+            else:
+                assert hit < count
+                assert _contains(rects[hit], px, py, 10)
+
+
+def test_pile_rects_beyond_capacity():
+    pile = PileLayout(0.0, 100.0, 6.0, 3.0, 40.0, 5.0, 10)
+    assert pile.rects(8, 12) == [pile._rect(i) for i in range(8, 12)]
+    assert pile.rects(16, 17)[0] == (6.0, 100.0 - 45.0, 3.0, 40.0)
+
+
+def test_scene_layout_is_cached_and_offset_by_position():
+    a = scene_layout(0, 0, 800, 600, 49, "divide", 1.0)
+    assert scene_layout(0, 0, 800, 600, 49, "divide", 1.0) is a
+    b = scene_layout(100, 50, 800, 600, 49, "divide", 1.0)
+    assert b.row.x == a.row.x + 100
+    assert b.row.y == a.row.y + 50
+
+    result = scene_layout(0, 0, 800, 600, 0, "result", 1.0)
+    assert len(result.result_lines) == 2
+    assert all(len(lines) == 6 for lines in result.result_lines)